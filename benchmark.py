@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+
+from benchmarks.suite import BENCHMARKS, SIZES, run, compare, scaling
+
+"""
+Benchmark entry point
+
+Runs the benchmark suite and compares it to the stored baseline, e.g.
+
+    python benchmark.py --sizes 100 1000 --only tick_mbf tick_prophet
+    python benchmark.py --save  # Store the results as the new baseline
+
+Exits with status 1 if a benchmark got slower than the baseline by more than the
+tolerance.
+"""
+
+BASELINE = 'benchmarks/baseline.json'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='Numbers of nodes to run with')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None, help='Benchmarks to run')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline file to compare with')
+    parser.add_argument('--save', action='store_true', help='Store the results in the baseline file')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Slowdown factor reported as a regression')
+    parser.add_argument('--plot', default=None, help='Save scaling curves to this image file (needs matplotlib)')
+    return parser.parse_args()
+
+
+def plot(results, path):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    for name, by_size in results.items():
+        sizes = sorted(by_size, key=int)
+        ax.plot([int(n) for n in sizes], [by_size[n]['time'] * 1e6 for n in sizes], marker='o', label=name)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Nodes')
+    ax.set_ylabel('Time per call (us)')
+    ax.legend()
+    plt.title('Benchmark scaling')
+    fig.savefig(path)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.only, args.sizes)
+
+    for name, exponent in scaling(results).items():
+        print(f'{name:<26} scales with nodes^{exponent:.2f}')
+    if args.plot is not None:
+        plot(results, args.plot)
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {}
+
+    if args.save:
+        # Merge, so baselines of benchmarks and sizes that were not run are kept
+        for name, by_size in results.items():
+            baseline.setdefault(name, {}).update(by_size)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+        sys.exit(0)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, n, ratio in regressions:
+        print(f'REGRESSION {name} at {n} nodes: {ratio:.2f}x slower than the baseline')
+    sys.exit(1 if regressions else 0)
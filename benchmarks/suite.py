@@ -0,0 +1,215 @@
+import contextlib
+import math
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.config import Config
+from core.engine import Engine
+from core.compute import nodes_in_range  # After core.engine, core.compute and core.simulator_entities import each other
+from core.node_factory import generate_waypoint_array, generate_mobility, generate_coordinate
+from core.random_streams import generator
+from core.simulator_entities import Packet
+from core.types import PacketType
+
+"""
+Benchmark suite
+
+Micro benchmarks of the hot paths of a tick and benchmarks of complete ticks, at
+growing numbers of nodes. The area grows with the number of nodes so the node
+density, and with it the number of neighbors per node, stays the same as in the
+default 100 node config.
+
+Every benchmark is a setup function taking the number of nodes and returning an
+operation and the number of calls one operation makes. The peak memory of the
+setup plus one operation is measured with tracemalloc, then the operation is
+timed without tracemalloc.
+"""
+
+SIZES = (100, 1_000, 5_000, 10_000)
+SEED = 23423098
+WARMUP_TICKS = 40  # 2 s of simulated time, enough for neighbors and estimations to exist
+MIN_TIME = 0.2  # s, every benchmark is repeated at least this long ...
+MIN_REPEATS = 3  # ... and at least this often
+
+# Overrides of every benchmark config, waypoints are only needed for the first few ticks
+BASE_CONFIG = {'num_waypoints': 50, 'mobility_cache': None}
+
+
+def benchmark_config(n, **overrides):
+    """
+    Config with n nodes and the node density of the default config
+    """
+    scale = math.sqrt(n / Config.n_nodes)
+    return Config(**{**BASE_CONFIG, 'n_nodes': n, 'width': round(Config.width * scale),
+                     'height': round(Config.height * scale), **overrides})
+
+
+def warm_engine(n, **overrides):
+    """
+    Engine with n nodes after WARMUP_TICKS ticks
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        engine = Engine(SEED, benchmark_config(n, **overrides), result_files=False)
+        for _ in range(WARMUP_TICKS):
+            engine.step()
+    return engine
+
+
+def bench_nodes_in_range(n):
+    engine = warm_engine(n)
+    power = engine.config.node_transmit_power
+    sample = engine.nodes[:100]
+
+    def operation():
+        for node in sample:
+            nodes_in_range(node, power, engine.nodes)
+    return operation, len(sample)
+
+
+def bench_select_relay(strategy):
+    def setup(n):
+        engine = warm_engine(n, strategy=strategy)
+        rng = generator(SEED, 0)
+        targets = [engine.nodes[int(i)].id for i in rng.integers(n, size=n)]
+        pairs = list(zip(engine.nodes, targets))
+        if strategy == 'mbf':
+            # After the warm-up most targets are still unknown and select_relay() would return early, seed the
+            # estimations as if the traffic updates of every target had reached every node
+            by_id = {node.id: node for node in engine.nodes}
+            for node, target_id in pairs:
+                if target_id not in node.node_estimations:
+                    node.node_estimations[target_id] = engine.own_mobility_payload(by_id[target_id])
+
+        def operation():
+            for node, target_id in pairs:
+                node.select_relay(target_id)
+        return operation, len(pairs)
+    return setup
+
+
+def bench_receive_update(strategy):
+    def setup(n):
+        engine = warm_engine(n, strategy=strategy)
+        # Every node receives the current update of every neighbor
+        deliveries = []
+        for node in engine.nodes:
+            packet = Packet(p_type=PacketType.TRAFFIC_UPDATE, src=node.id, dst=None, c_time=engine.sim_time,
+                            hop_count=0, tx_time=0, tx_mode='broadcast', payload=engine.service_payload(node))
+            deliveries.extend((neighbor, packet) for neighbor in node.nodes_in_range)
+
+        def operation():
+            for node in engine.nodes:
+                # Forget the neighbors seen in the warm-up, so that every PRoPHET update is a new encounter
+                node.prophet_old_nodes_in_range = []
+            for neighbor, packet in deliveries:
+                neighbor.receive(packet)
+        return operation, max(len(deliveries), 1)
+    return setup
+
+
+def bench_generate_waypoint_array(n):
+    config = benchmark_config(n)
+    rngs = [generator(SEED, 1, index) for index in range(n)]
+    starts = [generate_coordinate(config.width, config.height, rng=rng) for rng in rngs]
+
+    def operation():
+        for start, rng in zip(starts, rngs):
+            generate_waypoint_array(start, config.num_waypoints, config.h_factor, config.h_factor, config, rng)
+    return operation, len(rngs)
+
+
+def bench_generate_mobility(n):
+    config = benchmark_config(n)
+    rngs = [generator(SEED, 1, index) for index in range(n)]
+
+    def operation():
+        generate_mobility(config, rngs)
+    return operation, 1
+
+
+def bench_tick(strategy, **overrides):
+    def setup(n):
+        engine = warm_engine(n, strategy=strategy, **overrides)
+        return engine.step, 1
+    return setup
+
+
+BENCHMARKS = {
+    'nodes_in_range': bench_nodes_in_range,
+    'select_relay_mbf': bench_select_relay('mbf'),
+    'select_relay_prophet': bench_select_relay('prophet'),
+    'select_relay_random': bench_select_relay('random'),
+    'receive_update_mbf': bench_receive_update('mbf'),
+    'receive_update_prophet': bench_receive_update('prophet'),
+    'generate_waypoint_array': bench_generate_waypoint_array,
+    'generate_mobility': bench_generate_mobility,
+    'tick_mbf': bench_tick('mbf'),
+    'tick_prophet': bench_tick('prophet'),
+    'tick_random': bench_tick('random'),
+    'tick_random_array_nodes': bench_tick('random', array_backed_nodes=True),
+}
+
+
+def measure(setup, n):
+    """
+    Return the time per call in s and the peak memory in bytes of a benchmark
+    """
+    tracemalloc.start()
+    try:
+        operation, calls = setup(n)
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    repeats = 0
+    started = time.perf_counter()
+    while repeats < MIN_REPEATS or time.perf_counter() - started < MIN_TIME:
+        operation()
+        repeats += 1
+    return (time.perf_counter() - started) / (repeats * calls), peak
+
+
+def run(names=None, sizes=SIZES, report=print):
+    """
+    Run the named benchmarks (all by default) at every size, returns
+    {name: {n: {'time': s per call, 'peak': bytes}}}
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        for n in sizes:
+            seconds, peak = measure(BENCHMARKS[name], n)
+            results.setdefault(name, {})[str(n)] = {'time': seconds, 'peak': peak}
+            report(f'{name:<26} {n:>6} nodes {seconds * 1e6:>12.1f} us/call {peak / 2**20:>9.1f} MiB peak')
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the (name, n, ratio) of every result that is more than tolerance times
+    slower than its baseline
+    """
+    regressions = []
+    for name, by_size in results.items():
+        for n, result in by_size.items():
+            reference = baseline.get(name, {}).get(n)
+            if reference is not None and result['time'] > tolerance * reference['time']:
+                regressions.append((name, n, result['time'] / reference['time']))
+    return regressions
+
+
+def scaling(results):
+    """
+    Return the scaling exponent of every benchmark between its smallest and largest
+    size, 1 means time per call grows linearly with the number of nodes
+    """
+    exponents = {}
+    for name, by_size in results.items():
+        sizes = sorted(by_size, key=int)
+        if len(sizes) > 1:
+            first, last = by_size[sizes[0]]['time'], by_size[sizes[-1]]['time']
+            exponents[name] = float(np.log(last / first) / np.log(int(sizes[-1]) / int(sizes[0])))
+    return exponents
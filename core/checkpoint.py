@@ -0,0 +1,84 @@
+import gzip
+import io
+import os
+import pickle
+import tempfile
+from types import MappingProxyType
+
+from core.simulator_entities import Node
+
+"""
+Checkpoints
+
+Complete state of a run, written to a gzip-compressed pickle: the engine with its
+config, clock, link state and result bookkeeping, every node with its queue,
+radio task, estimations and random generators, and the run's metrics. A run
+restored from a checkpoint continues exactly like the run that wrote it.
+
+Nodes reference each other (neighbors, relays, the spatial grid), so pickling the
+engine in one go would recurse through the whole node graph. Instead, every
+reference to a node is written as its index, and node states are written one by
+one; loading first creates an empty node per index and then fills in the states.
+
+Per-run resources that are not simulation state, the packet trace file and the
+profiler, are not part of a checkpoint. The engine reopens them on restore.
+"""
+
+
+def reduce_mapping_proxy(proxy):
+    return MappingProxyType, (dict(proxy),)
+
+
+class CheckpointPickler(pickle.Pickler):
+    dispatch_table = {MappingProxyType: reduce_mapping_proxy}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Node):
+            return type(obj), obj.index
+        return None
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self.nodes = {}  # key: node index, value: node, empty until its state is loaded
+
+    def persistent_load(self, pid):
+        cls, index = pid
+        if index not in self.nodes:
+            self.nodes[index] = cls.__new__(cls)
+        return self.nodes[index]
+
+
+def save(engine, path):
+    """
+    Write the state of engine to path, atomically
+    """
+    buffer = io.BytesIO()
+    pickler = CheckpointPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dump(engine)
+    pickler.dump([node.__getstate__() for node in engine.nodes])
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    file, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(file, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as stream:
+            stream.write(buffer.getbuffer())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load(path):
+    """
+    Return the engine stored at path, without its per-run resources, see
+    Engine.restore()
+    """
+    with gzip.open(path, 'rb') as stream:
+        unpickler = CheckpointUnpickler(stream)
+        engine = unpickler.load()
+        for node, state in zip(engine.nodes, unpickler.load()):
+            node.__dict__.update(state)
+    return engine
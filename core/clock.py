@@ -0,0 +1,14 @@
+"""
+Clock
+
+Simulation time of one run in ms, shared by the run's engine and all of its
+nodes. Every run has its own clock, so runs in the same process can be stepped
+in any order.
+"""
+
+
+class Clock:
+    __slots__ = ('time',)
+
+    def __init__(self, time=0):
+        self.time = time
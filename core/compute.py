@@ -1,4 +1,5 @@
 from core.simulator_entities import *
+import math
 import random
 import numpy as np
 
@@ -8,35 +9,98 @@ def nodes_in_range(node_a, power, nodes):
             if ((node_b.coordinate.x - node_a.coordinate.x)**2 + (node_b.coordinate.y - node_a.coordinate.y)**2) <= r_2]
 
 
-def point_bounce(coordinate):
+def pairs_in_range(xs, ys, first, second, power):
+    """
+    Vectorized range check for node pairs. xs and ys hold the coordinates of all
+    nodes, first and second the node indices of each pair. Returns a boolean mask
+    selecting the pairs that are within range of each other.
+    """
+    r_2 = (power / 2)**2
+    return ((xs[second] - xs[first])**2 + (ys[second] - ys[first])**2) <= r_2
+
+
+def link_event_times(dx, dy, dvx, dvy, power, linked, tolerance=1e-9):
+    """
+    Predict the next link event of node pairs moving in straight lines. dx, dy is the
+    relative position and dvx, dvy the relative velocity (per ms) of each pair, linked
+    whether the pair currently has a link. Returns the time until each linked pair
+    leaves range and each unlinked pair enters range, inf if that never happens.
+    """
+    r_2 = (power / 2)**2
+    a = dvx**2 + dvy**2
+    b = 2 * (dx * dvx + dy * dvy)
+    c = dx**2 + dy**2 - r_2
+    disc = b**2 - 4 * a * c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(np.maximum(disc, 0))
+        first = (-b - root) / (2 * a)  # Range is entered here ...
+        second = (-b + root) / (2 * a)  # ... and left here
+
+    times = np.full(len(dx), np.inf)
+    crossing = (a > 0) & (disc >= 0)
+
+    leave = linked & crossing
+    times[leave] = np.maximum(second[leave], 0)
+    times[linked & ~crossing & (c > 0)] = 0  # Out of range and not coming back, drop the link now
+
+    enter = ~linked & crossing & (second > tolerance)  # Part of the in-range interval lies ahead
+    times[enter] = np.maximum(first[enter], 0)
+    times[~linked & ~crossing & (c <= 0)] = 0  # In range without moving relative to each other
+    return times
+
+
+def link_event_time(dx, dy, dvx, dvy, power, linked, tolerance=1e-9):
+    """
+    link_event_times() of a single pair, without the overhead of NumPy on scalars
+    """
+    r_2 = (power / 2)**2
+    a = dvx * dvx + dvy * dvy
+    b = 2 * (dx * dvx + dy * dvy)
+    c = dx * dx + dy * dy - r_2
+    disc = b * b - 4 * a * c
+    if a > 0 and disc >= 0:
+        root = math.sqrt(disc)
+        if linked:
+            return max((-b + root) / (2 * a), 0)  # Time the range is left
+        if (-b + root) / (2 * a) > tolerance:
+            return max((-b - root) / (2 * a), 0)  # Time the range is entered
+        return math.inf
+    if linked:
+        return 0 if c > 0 else math.inf  # Out of range and not coming back, drop the link now
+    return 0 if c <= 0 else math.inf  # In range without moving relative to each other
+
+
+def point_bounce(coordinate, config=Config):
     if coordinate.x < 0:
         coordinate.x = -coordinate.x
-    coordinate.x %= 2 * Config.width
-    if coordinate.x > Config.width:
-        coordinate.x = 2 * Config.width - coordinate.x
+    coordinate.x %= 2 * config.width
+    if coordinate.x > config.width:
+        coordinate.x = 2 * config.width - coordinate.x
 
     if coordinate.y < 0:
         coordinate.y = -coordinate.y
-    coordinate.y %= 2 * Config.height
-    if coordinate.y > Config.height:
-        coordinate.y = 2 * Config.height - coordinate.y
+    coordinate.y %= 2 * config.height
+    if coordinate.y > config.height:
+        coordinate.y = 2 * config.height - coordinate.y
 
     return coordinate
 
 
-def compute_packet_generation_times(mean_production_interval):
+def compute_packet_generation_times(mean_production_interval, config=Config, rng=None):
     """
     Use a Poisson process to determine when packets are generated inside a node.
     This function will return an array with the timestamps at which a packet
     will be generated by the node.
     """
+    if rng is None:
+        rng = np.random.default_rng()
     # Create as many random generation intervals as there is (on average) time for in the simulation
     inter_arrival_time_samples = \
-        np.random.exponential(mean_production_interval,
-                              size=int((Config.max_sim_time/Config.mean_packet_production_interval)/Config.generation_one_on_n))
+        rng.exponential(mean_production_interval,
+                        size=int((config.max_sim_time/config.mean_packet_production_interval)/config.generation_one_on_n))
 
     inter_arrival_times = (np.ceil(inter_arrival_time_samples
-                                   / Config.simulation_interval) * Config.simulation_interval).astype(int)
+                                   / config.simulation_interval) * config.simulation_interval).astype(int)
 
     for i, inter_arrival_time in enumerate(inter_arrival_times):
         if i == 0:
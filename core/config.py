@@ -18,8 +18,37 @@ class Config:
     node_velocity_dd = 5
 
     n_nodes = 100
+    array_backed_nodes = False  # Keep mobility state in a NodeStore and move all nodes with one vectorized step
     node_transmit_power = 150  # Second 3 at 500, first at 200
 
+    engine = 'tick'  # 'tick': fixed simulation_interval steps, 'event': discrete-event scheduler (headless only)
+
+    # Tick engine: compute all link events of the run up front from the mobility (cached like the mobility, so
+    # runs with other strategies reuse them) and replay them instead of discovering links every tick
+    contact_plan = False
+
+    # Directory of cached start coordinates, velocities and waypoints, shared by runs with the same mobility
+    # config and seed, None disables the cache. headless.py and sweep.py enable it, see --mobility-cache
+    mobility_cache = None
+
+    # Results store every run appends its result row to, see core.results_store
+    results_path = 'results/test_run_1'
+    # Directory of binary packet event traces, one file per run (see core.packet_trace), None disables tracing
+    packet_trace = None
+    packet_trace_background = False  # Write trace chunks on a background thread
+    # Directory of per-run profiles, a table of the time spent in every phase of the simulation loop and a
+    # per-tick timeline (see core.profiling), None disables profiling
+    profile = None
+    # Directory of checkpoints, the state of every run is saved there every checkpoint_interval ms of
+    # simulated time and can be resumed with headless.py --resume (see core.checkpoint), None disables checkpoints
+    checkpoint = None
+    checkpoint_interval = 600_000  # ms
+    # Metrics, see core.metrics
+    metrics_delay_bin = 100  # ms, width of the delay histogram bins
+    # ms, take a delivery ratio snapshot this often during the run, None disables. Snapshots are written to
+    # <results_path>/snapshots/<run name>.npz when the run finishes
+    metrics_snapshot_interval = None
+
     frame_interval = 16  # ms
     simulation_interval = 50  # ms
     mean_packet_production_interval = 1_500  # ms
@@ -44,11 +73,38 @@ class Config:
     prophet_gamma = 0.95  # Used for aging probabilities, once per second (0 < prophet_gamma < 1)
 
     # MBF
+    # Only send neighbors the estimations that changed since their last update, merge received ones by timestamp
+    mbf_delta_updates = False
     max_vector_age = max_sim_time / 10
     # After a packet has been in the queue for this time, it will be forwarded, regardless of vector, if possible
     queue_remain_time = max_sim_time / 30
 
-
-
-
-
+    def __init__(self, **overrides):
+        """
+        Configuration of a single run: the class attributes above are the defaults,
+        overrides are set on this instance only. Fields derived from max_sim_time
+        follow it unless they are overridden as well.
+        """
+        fields = Config.fields()
+        for name, value in overrides.items():
+            if name not in fields:
+                raise AttributeError(f'Config has no field {name}')
+            setattr(self, name, value)
+        if 'max_sim_time' in overrides:
+            if 'max_packet_age' not in overrides: self.max_packet_age = self.max_sim_time
+            if 'max_vector_age' not in overrides: self.max_vector_age = self.max_sim_time / 10
+            if 'queue_remain_time' not in overrides: self.queue_remain_time = self.max_sim_time / 30
+
+    @classmethod
+    def fields(cls):
+        """
+        Return the names and default values of all config fields
+        """
+        return {name: value for name, value in vars(Config).items()
+                if not name.startswith('_') and not callable(value) and not isinstance(value, classmethod)}
+
+    def values(self):
+        """
+        Return all config fields with their values for this run
+        """
+        return {name: getattr(self, name) for name in Config.fields()}
@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+
+from core.compute import pairs_in_range
+from core.node_store import NodeStore
+from core.spatial import cell_pairs
+
+"""
+Contact plan
+
+In the tick engine, which nodes are in range of each other only depends on
+mobility, not on the forwarding strategy. A contact plan is the complete list
+of link events of a run, computed once from the mobility and replayed by every
+strategy instead of checking distances every tick.
+
+Link events are stored sorted by tick, and by link key (i << 32 | j, i < j)
+within a tick, together with the offset of the first event of every tick. The
+link-up/link-down intervals of a pair are its consecutive up and down events.
+"""
+
+
+class ContactPlan:
+    def __init__(self, steps, keys, up, n_steps):
+        self.steps = steps  # Tick of every link event
+        self.keys = keys  # Link key of every link event
+        self.up = up  # Whether the link came up or went down
+        self.offsets = np.searchsorted(steps, np.arange(n_steps + 1))  # First event of every tick
+
+    def events(self, step):
+        """
+        Return the keys of the links that came up and went down at tick step, sorted,
+        the same as Engine.discover_links() returns them
+        """
+        if step + 1 >= len(self.offsets):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        begin, end = self.offsets[step], self.offsets[step + 1]
+        keys, up = self.keys[begin:end], self.up[begin:end]
+        return keys[up], keys[~up]
+
+    @staticmethod
+    def n_steps(config):
+        """
+        Number of ticks of a run, the first tick does not advance time
+        """
+        return math.ceil(config.max_sim_time / config.simulation_interval) + 1
+
+    @staticmethod
+    def compute(coordinates, velocities, waypoints, rngs, config):
+        """
+        Compute the link events of a run from the start coordinates, start velocities,
+        waypoints and mobility generators of its nodes. Returns (steps, keys, up).
+
+        Nodes are moved with NodeStore.step() exactly like the engine moves them, and
+        links are discovered every tick on the same grid as Engine.discover_links().
+        Only the positions of the current tick and the links of the previous one are
+        kept, instead of the positions of all ticks.
+
+        Time is still stepped tick by tick, and not solved in closed form from
+        piecewise-linear trajectories with link_event_times() like the event engine
+        does. Replay has to reproduce the links the tick engine would discover, and
+        those follow the stepped positions: rounded to Config.granularity every tick,
+        with waypoint turns on the first tick closer than the velocity. Crossing times
+        of the exact trajectories land on other ticks for pairs that graze the range.
+        """
+        n_steps = ContactPlan.n_steps(config)
+        store = NodeStore(config)
+        for row in range(len(coordinates)):
+            store.allocate(rngs[row])
+            store.x[row], store.y[row] = coordinates[row]
+            store.velocity[row] = velocities[row]
+            store.set_waypoints(row, waypoints[row])
+            if len(waypoints[row]):
+                # Heading towards the first waypoint, like Node.__init__()
+                store.heading[row] = math.atan2(waypoints[row][0][1] - coordinates[row][1],
+                                                waypoints[row][0][0] - coordinates[row][0])
+
+        cell_size = config.node_transmit_power / 2  # Same grid as the engine's
+        n = store.size
+        store.changed_cells(cell_size)
+
+        link_keys = np.empty(0, dtype=np.int64)
+        steps, keys, up = [], [], []
+        for step in range(n_steps):
+            # Links are discovered before the nodes move, like in Engine.step()
+            first, second = cell_pairs(store.cell_x[:n], store.cell_y[:n])
+            in_range = pairs_in_range(store.x, store.y, first, second, config.node_transmit_power)
+            current = np.sort((first[in_range] << 32) | second[in_range])
+            links_up = np.setdiff1d(current, link_keys, assume_unique=True)
+            links_down = np.setdiff1d(link_keys, current, assume_unique=True)
+            link_keys = current
+
+            # Sorted by link key within the tick
+            step_keys = np.concatenate([links_up, links_down])
+            order = np.argsort(step_keys)
+            steps.append(np.full(len(step_keys), step, dtype=np.int64))
+            keys.append(step_keys[order])
+            up.append(np.arange(len(step_keys))[order] < len(links_up))
+
+            store.step()
+            store.changed_cells(cell_size)
+        return np.concatenate(steps), np.concatenate(keys), np.concatenate(up)
+
@@ -0,0 +1,478 @@
+import datetime
+import math
+import os
+import time
+from operator import attrgetter
+
+import numpy as np
+
+from core.config import Config
+from core.simulator_entities import Node, Packet, Coordinate, MobilityPayload
+from core.types import PacketType
+from core.compute import pairs_in_range
+from core.node_factory import generate_mobility
+from core.mobility_cache import cached_mobility, cached_contact_plan
+from core.contact_plan import ContactPlan
+from core.node_store import NodeStore, ArrayNode
+from core.results_store import ResultsStore
+from core.packet_trace import PacketTrace
+from core.metrics import Metrics
+from core.clock import Clock
+from core.profiling import Profiler, unwrapped
+from core import checkpoint
+from core.random_streams import generator, NodeStreams, IDS, NODES, MOBILITY
+from core.spatial import SpatialGrid
+from graphics.text_formatting import Color
+
+
+class Engine:
+    """
+    Headless simulation engine
+
+    Owns the nodes, the simulation clock and all simulation hooks. One call to
+    step() performs exactly one simulation tick (node processing, neighbor
+    discovery, motion and time advancement), so a run is fully determined by its
+    seed regardless of whether it is driven by run() or by the Tkinter display.
+    """
+    # Methods timed when profiling, on the engine and on every node
+    profiled_phases = ('queue_hook', 'discover_links', 'apply_link_events', 'send_service_broadcast_packet',
+                       'node_time_hook', 'motion_hook')
+    profiled_node_phases = ('update_core', 'select_relay', 'receive', 'update_traffic_table', 'update_pos')
+
+    def __init__(self, seed, config=None, result_files=True):
+        # Configuration of this run, Config defaults unless overridden
+        self.config = Config() if config is None else config
+
+        # All randomness comes from generators derived from the seed, see core.random_streams
+        self.seed = seed
+        self.id_rng = generator(seed, IDS)
+
+        self.nodes = []  # Ordered, iteration order is part of the simulation outcome
+        self.node_ids = set()  # Ids in use, ids are drawn at random and must be unique
+        # Neighbor discovery index, cells are as large as the radio range
+        self.grid = SpatialGrid(self.config.node_transmit_power / 2)
+        # Current links as sorted keys (i << 32 | j, i < j), and the nodes whose neighbors changed last tick
+        self.link_keys = np.empty(0, dtype=np.int64)
+        self.changed_nodes = []
+        # Optional struct-of-arrays mobility state, nodes become views on its rows
+        self.store = self.make_store()
+        # Optional precomputed link events, replayed instead of discovering links every tick
+        self.contact_plan = None
+
+        self.bind_strategy()
+
+        self.results = None  # Results store the result row is appended to on exit
+        self.trace = None  # Optional packet event trace, see core.packet_trace
+        self.trace_path = None
+        self.trace_size = 0  # Size of the trace file at the last checkpoint
+        self.metrics = Metrics(self.config)  # Packet metrics, updated by the nodes during the run
+        # Node time, shared by all nodes. Lags sim_time by one tick between steps, see node_time_hook()
+        self.clock = Clock()
+        self.profiler = None  # Optional per-phase timing, see core.profiling
+        self.checkpoint_path = None  # Optional checkpoint file, rewritten every Config.checkpoint_interval
+        self.next_checkpoint = math.inf
+        self.start_time = int(time.time())
+        self.h_factor = self.config.h_factor
+
+        # Initialize result files
+        if result_files:
+            self.initialize_result_files()
+
+        if self.config.packet_trace is not None:
+            self.initialize_trace()
+        if self.config.checkpoint is not None:
+            self.checkpoint_path = os.path.join(self.config.checkpoint, f'{self.run_name()}.ckpt')
+            self.next_checkpoint = self.config.checkpoint_interval
+
+        self.initialize_nodes()
+
+        self.started = False
+        self.sim_time = 0
+        self.step_count = 0  # Ticks done, the first tick does not advance sim_time
+
+        if self.config.profile is not None:
+            self.initialize_profiler()
+
+    def bind_strategy(self):
+        """
+        Strategy dispatch, bound once here instead of comparing strategy names on
+        every broadcast. Call again after changing the strategy of self.config
+        """
+        if self.config.strategy == 'mbf' and self.config.mbf_delta_updates:
+            self.send_service_broadcast_packet = self.send_delta_update
+        else:
+            vars(self).pop('send_service_broadcast_packet', None)
+        self.service_payload = getattr(self, f'service_payload_{self.config.strategy}')
+
+    def initialize_result_files(self):
+        self.start_time = int(time.time())
+        print(self.config.values())
+        self.h_factor = self.config.h_factor
+        self.results = ResultsStore(self.config.results_path)
+
+    def initialize_trace(self):
+        os.makedirs(self.config.packet_trace, exist_ok=True)
+        self.trace_path = os.path.join(self.config.packet_trace, f'{self.run_name()}.trace')
+        self.trace = PacketTrace(self.trace_path, background=self.config.packet_trace_background)
+
+    def initialize_profiler(self):
+        """
+        Replace the profiled methods with timed wrappers, the simulation loop itself
+        has no profiling code
+        """
+        self.profiler = Profiler()
+        self.profiler.instrument(self, self.profiled_phases)
+        for node in self.nodes:
+            self.profiler.instrument(node, self.profiled_node_phases, 'node.')
+        step = self.profiler.wrap('step', self.step)
+
+        def profiled_step():
+            step()
+            self.profiler.end_tick(self.sim_time)
+        self.profiler.replace(self, 'step', profiled_step)
+
+    def run_name(self):
+        """
+        File name of the per-run output files of this run
+        """
+        return f'{self.config.strategy}_{self.seed}_{self.start_time}_{os.getpid()}'
+
+    def initialize_nodes(self):
+        streams = [NodeStreams(self.seed, index) for index in range(self.config.n_nodes)]
+        # Mobility of all nodes in one vectorized pass, or from the cache of an earlier run with the same mobility
+        coordinates, velocities, waypoints = cached_mobility(
+            self.config, self.seed, lambda: generate_mobility(self.config, [node_streams.waypoints for node_streams in streams]))
+        for i in range(self.config.n_nodes):
+            self.create_node(coordinate=Coordinate(float(coordinates[i, 0]), float(coordinates[i, 1]))
+                             , velocity=float(velocities[i])
+                             , waypoints=waypoints[i]
+                             , streams=streams[i])
+        self.contact_plan = self.make_contact_plan(coordinates, velocities, waypoints)
+        node_indices = {node.id: node.index for node in self.nodes}
+        all_node_ids = [node.id for node in self.nodes]  # Shared, read-only
+        for node in self.nodes:
+            # Packet ids are numbered by Metrics.sent, they are only unique if all nodes count in the same Metrics
+            assert node.metrics is self.metrics, f'{node.id} does not share the metrics of the run'
+            node.all_node_ids = all_node_ids
+            node.trace = self.trace
+            if self.config.strategy == 'prophet':
+                # Set all probabilities to 0 at the start
+                node.prophet_init(node_indices)
+
+    def make_store(self):
+        return NodeStore(self.config) if self.config.array_backed_nodes else None
+
+    def make_contact_plan(self, coordinates, velocities, waypoints):
+        if not self.config.contact_plan:
+            return None
+        # Computed with fresh mobility generators, the ones of the nodes are consumed by the run itself
+        plan = cached_contact_plan(self.config, self.seed, lambda: ContactPlan.compute(
+            coordinates, velocities, waypoints,
+            [generator(self.seed, NODES, index, MOBILITY) for index in range(self.config.n_nodes)], self.config))
+        return ContactPlan(*plan, n_steps=ContactPlan.n_steps(self.config))
+
+    def create_node(self, num_waypoints=None, h_factor=None, v_factor=None, coordinate=None, velocity=None,
+                    waypoints=None, streams=None):
+        """
+        Create a node and add it to the simulation. waypoints is an (n, 2) array, the
+        mobility that is not given is generated here
+        """
+        if streams is None: streams = NodeStreams(self.seed, len(self.nodes))
+        if velocity is None or waypoints is None:
+            coordinates, velocities, waypoints = generate_mobility(self.config, [streams.waypoints], num_waypoints,
+                                                                   h_factor, v_factor,
+                                                                   None if coordinate is None else [coordinate])
+            coordinate = Coordinate(float(coordinates[0, 0]), float(coordinates[0, 1]))
+            velocity, waypoints = float(velocities[0]), waypoints[0]
+        if self.store is None:
+            # Object nodes walk a list of Coordinates, array-backed nodes keep the array
+            waypoints = [Coordinate(x, y) for x, y in waypoints.tolist()]
+        node_args = (self.new_node_id()
+                     , coordinate
+                     , velocity
+                     , waypoints
+                     , self.config
+                     , streams
+                     , self.metrics
+                     , self.clock)
+        node = Node(*node_args) if self.store is None else ArrayNode(self.store, *node_args)
+        node.index = len(self.nodes)
+        self.nodes.append(node)
+        self.grid.insert(node)
+        if self.store is not None:
+            # Start the cell cache of the store at the node's grid cell, see motion_hook()
+            self.store.cell_x[node.row], self.store.cell_y[node.row] = self.grid.node_cells[node]
+        return node
+
+    def new_node_id(self):
+        """
+        Draw a node id that is not in use yet
+        """
+        while True:
+            node_id = f"Node_{self.id_rng.integers(0, 99999999, endpoint=True)}"
+            if node_id not in self.node_ids:
+                self.node_ids.add(node_id)
+                return node_id
+
+    def run(self):
+        """
+        Run the simulation without any pacing until Config.max_sim_time is reached
+        """
+        print(f"{Color.GREEN}{Color.BOLD}Simulation started at:{Color.END}"
+              f" {Color.UNDERLINE}{datetime.datetime.now()}{Color.END}")
+        while not self.is_finished():
+            self.step()
+            if self.sim_time >= self.next_checkpoint:
+                self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """
+        Write the state of the run to its checkpoint file, see core.checkpoint
+        """
+        while self.next_checkpoint <= self.sim_time:
+            self.next_checkpoint += self.config.checkpoint_interval
+        if self.trace is not None:
+            self.trace_size = self.trace.sync()  # A restored run continues the trace from here
+        checkpoint.save(self, self.checkpoint_path)
+
+    @staticmethod
+    def restore(path):
+        """
+        Return the engine of the run checkpointed at path, ready to continue
+        """
+        engine = checkpoint.load(path)
+        if engine.config.packet_trace is not None:
+            engine.trace = PacketTrace(engine.trace_path, background=engine.config.packet_trace_background,
+                                       resume_at=engine.trace_size)
+            for node in engine.nodes:
+                node.trace = engine.trace
+        if engine.config.profile is not None:
+            engine.initialize_profiler()
+        return engine
+
+    def __getstate__(self):
+        # Per-run resources are reopened by restore(), profiled methods are stored unwrapped
+        state = unwrapped(self.__dict__)
+        state['trace'] = None
+        state['profiler'] = None
+        state.pop('step', None)
+        return state
+
+    def is_finished(self):
+        return self.sim_time >= self.config.max_sim_time
+
+    def step(self):
+        """Simulation hooks go here"""
+        self.queue_hook()
+        self.node_time_hook()
+        self.motion_hook()
+        """Simulation hooks go here"""
+        self.step_count += 1
+        if self.started:
+            self.sim_time += self.config.simulation_interval
+            self.metrics.observe(self.sim_time)
+        else:
+            self.started = True
+
+    def queue_hook(self):
+        for node in self.nodes:
+            # Node processes
+            if not node.finished:
+                node.update_core()
+
+        # Compute the neighbor relation once for all pairs, or replay it from the contact plan,
+        # and send updates for nodes whose links changed
+        if self.contact_plan is not None:
+            links_up, links_down = self.contact_plan.events(self.step_count)
+        else:
+            links_up, links_down = self.discover_links()
+        for node in self.apply_link_events(links_up, links_down):
+            self.send_service_broadcast_packet(src_node=node)
+
+    def positions(self):
+        if self.store is not None:
+            return self.store.x[:self.store.size], self.store.y[:self.store.size]
+        xs = np.fromiter((node.coordinate.x for node in self.nodes), dtype=float, count=len(self.nodes))
+        ys = np.fromiter((node.coordinate.y for node in self.nodes), dtype=float, count=len(self.nodes))
+        return xs, ys
+
+    def discover_links(self):
+        """
+        Evaluate every candidate pair of the spatial grid once, and return the keys of
+        the links that came up and went down since the previous call
+        """
+        xs, ys = self.positions()
+        first, second = self.grid.candidate_pairs()
+        in_range = pairs_in_range(xs, ys, first, second, self.config.node_transmit_power)
+        link_keys = np.sort((first[in_range] << 32) | second[in_range])
+
+        links_up = np.setdiff1d(link_keys, self.link_keys, assume_unique=True)
+        links_down = np.setdiff1d(self.link_keys, link_keys, assume_unique=True)
+        self.link_keys = link_keys
+        return links_up, links_down
+
+    def apply_link_events(self, links_up, links_down):
+        """
+        Update the neighbor lists of both ends of every link event, and return the
+        nodes whose neighbors changed, in node order
+        """
+        # Nodes that changed in the previous tick have not encountered anyone new since
+        for node in self.changed_nodes:
+            node.prophet_old_nodes_in_range = node.nodes_in_range
+
+        neighbors = {}  # key: node, value: set of nodes in range
+        for keys, link_up in ((links_up, True), (links_down, False)):
+            for key in keys.tolist():
+                node_a, node_b = self.nodes[key >> 32], self.nodes[key & 0xFFFFFFFF]
+                for node, other in ((node_a, node_b), (node_b, node_a)):
+                    in_range = neighbors.setdefault(node, set(node.nodes_in_range))
+                    if link_up:
+                        in_range.add(other)
+                    else:
+                        in_range.discard(other)
+
+        self.changed_nodes = sorted(neighbors, key=attrgetter('index'))
+        for node in self.changed_nodes:
+            node.prophet_old_nodes_in_range = node.nodes_in_range
+            node.nodes_in_range = sorted(neighbors[node], key=attrgetter('index'))
+        return self.changed_nodes
+
+    def send_service_broadcast_packet(self, src_node):
+        packet = Packet(
+            p_type=PacketType.TRAFFIC_UPDATE,
+            src=src_node.id,
+            dst=None,
+            c_time=self.sim_time,
+            hop_count=0,
+            tx_time=0,
+            tx_mode='broadcast',
+            payload=self.service_payload(src_node)
+        )
+        # Broadcast update, all receivers share the same packet and payload
+        src_node.broadcast_zero_time(packet)
+
+    def send_delta_update(self, src_node):
+        # MBF delta updates, every neighbor gets its own payload
+        src_node.delta_broadcast_zero_time(self.own_mobility_payload(src_node), self.sim_time)
+
+    def own_mobility_payload(self, src_node):
+        # The coordinate is a snapshot
+        return MobilityPayload(
+            coordinate=Coordinate(src_node.coordinate.x, src_node.coordinate.y),
+            vector=src_node.vector,
+            timestamp=src_node.sim_time
+        )
+
+    def service_payload_mbf(self, src_node):
+        # Payload for Mobility Based Forwarding
+        return {**src_node.node_estimations, **{src_node.id: self.own_mobility_payload(src_node)}}
+
+    def service_payload_prophet(self, src_node):
+        # Payload for PRoPHET, the read-only predictability vector itself
+        return src_node.node_estimations.vector()
+
+    def service_payload_random(self, src_node):
+        return None
+
+    def node_time_hook(self):
+        self.clock.time = self.sim_time
+
+    def motion_hook(self):
+        # Replayed links do not need the spatial grid
+        update_grid = self.contact_plan is None
+        if self.store is not None:
+            self.store.step()
+            if update_grid:
+                for row in self.store.changed_cells(self.grid.cell_size):
+                    self.grid.update(self.nodes[row])
+            return
+        for node in self.nodes:
+            node.update_pos()
+            if update_grid:
+                self.grid.update(node)
+
+    def summary(self):
+        """
+        The result row of this run, from the metrics collected during the run
+        """
+        metrics = self.metrics
+        total_queue = sum(len(node.queue) + (node.radioTask is not None) for node in self.nodes)
+        return {
+            'end_time': self.start_time,
+            'run_time': self.config.max_sim_time,
+            'avg_delay': metrics.average(metrics.delay, 1000),
+            'avg_hop_count': metrics.average(metrics.hops),
+            'success_count': metrics.delivered,
+            'failure_count': metrics.sent - metrics.delivered,
+            'failure_queue_limit': metrics.failure_queue_limit,
+            'failure_hop_limit': metrics.failure_hop_limit,
+            'failure_tx_limit': metrics.failure_tx_limit,
+            'failure_time_limit': metrics.failure_time_limit,
+            'total_in_queue': total_queue,
+            'total_sent': metrics.sent,
+            'config_h_factor': self.h_factor,
+            'total_success': metrics.delivered,
+            'total_duplicates': metrics.duplicates,
+            'delay_std': metrics.scaled(metrics.delay.std(), 1000),
+            'delay_p50': metrics.scaled(metrics.delay_histogram.quantile(0.5), 1000),
+            'delay_p90': metrics.scaled(metrics.delay_histogram.quantile(0.9), 1000),
+            'delay_p99': metrics.scaled(metrics.delay_histogram.quantile(0.99), 1000),
+            'hop_count_std': metrics.scaled(metrics.hops.std()),
+        }
+
+    def exit_handler(self):
+        summary = self.summary()
+        self.print_summary(summary)
+        self.finish()
+        if self.results is not None:
+            self.write_results(summary)
+
+    def finish(self):
+        """
+        Close the packet trace, and write the metrics snapshots and the profile of
+        this run and remove the profiling wrappers, if enabled
+        """
+        if self.trace is not None:
+            self.trace.close()
+        if self.config.metrics_snapshot_interval is not None:
+            snapshot_path = os.path.join(self.config.results_path, 'snapshots')
+            os.makedirs(snapshot_path, exist_ok=True)
+            np.savez(os.path.join(snapshot_path, f'{self.run_name()}.npz'), **self.metrics.snapshot_table())
+        if self.profiler is not None:
+            print(self.profiler.table())
+            os.makedirs(self.config.profile, exist_ok=True)
+            self.profiler.write_timeline(os.path.join(self.config.profile, f'{self.run_name()}.npz'))
+            self.profiler.restore()
+
+    def print_summary(self, summary):
+        print(f"{Color.RED}{Color.BOLD}Simulation stopped at:{Color.END} "
+              f"{Color.UNDERLINE}{datetime.datetime.now()}{Color.END}")
+        print("------------------------------SUMMARY-----------------------------------")
+        print(f"Success: {Color.GREEN}{Color.BOLD}{summary['total_success']}{Color.END}")
+        print(f"Total failed: {Color.RED}{Color.BOLD}{summary['failure_count']}{Color.END}")
+        print(f"      Queue limit : {Color.RED}{Color.BOLD}{summary['failure_queue_limit']}{Color.END}")
+        print(f"      Hop limit   : {Color.RED}{Color.BOLD}{summary['failure_hop_limit']}{Color.END}")
+        print(f"      Tx limit    : {Color.RED}{Color.BOLD}{summary['failure_tx_limit']}{Color.END}")
+        print(f"      Time limit  : {Color.RED}{Color.BOLD}{summary['failure_time_limit']}{Color.END}")
+
+        print(f"Total duplicates: {Color.RED}{Color.BOLD}{summary['total_duplicates']}{Color.END}")
+
+        print(f"In queue : {Color.BLUE}{Color.BOLD}{summary['total_in_queue']}{Color.END}")
+        print(f"Avg delay: {Color.PURPLE}{Color.BOLD}{summary['avg_delay']}{Color.END}")
+        print(f"Delay p50/p90/p99: {Color.PURPLE}{summary['delay_p50']} / {summary['delay_p90']} / "
+              f"{summary['delay_p99']}{Color.END}")
+        print(f"Avg hops: {Color.YELLOW}{Color.BOLD}{summary['avg_hop_count']}{Color.END}")
+
+        print("------------------------------------------------------------------------")
+        print(f"Total sent: {Color.CYAN}{summary['total_sent']}{Color.END}")
+        print(f"Strategy: {Color.BOLD}{Color.BLUE}{self.config.strategy}{Color.END}")
+
+    def result_row(self, summary):
+        """
+        All config fields, the seed and the metrics of this run, one row of the results store
+        """
+        return {**self.config.values(), 'seed': self.seed, **summary}
+
+    def write_results(self, summary):
+        self.results.append(self.result_row(summary))
+
@@ -0,0 +1,308 @@
+import datetime
+
+import numpy as np
+
+from core.simulator_entities import RadioTask
+from core.compute import link_event_time, link_event_times
+from core.engine import Engine
+from core.events import EventQueue
+from core.node_store import NodeStore
+from core.packet_trace import TRANSMITTED, DROP_TX_LIMIT
+from core.trajectory import Trajectories
+from core.types import EventType
+from graphics.text_formatting import Color
+
+
+class EventEngine(Engine):
+    """
+    Discrete-event simulation engine
+
+    Instead of advancing every node every Config.simulation_interval, simulated time
+    jumps directly to the next event: waypoint arrivals, link-up and link-down of
+    node pairs, packet generation, transmission completion and PRoPHET aging.
+
+    Nodes move in straight lines between waypoints. Their trajectories are compiled
+    up front (see Trajectories), positions follow from the current segment of each
+    node and link events of a pair are predicted by solving for the time its
+    distance crosses the radio range. Predictions are valid until either node
+    starts a new segment.
+
+    Relay selection is not polled. A node without relay for its radio task tries
+    again only when something it selects from changes: a link of the node comes up,
+    the node arrives at a waypoint, or its queue changes through a generated or
+    received packet. Each attempt without relay moves on to the next queued packet,
+    like each tick does in the tick engine. A transmission completes packet.tx_time
+    after it started.
+
+    Mobility timing follows the tick engine: a node turns to its next waypoint once
+    it is closer to the current one than its velocity. What is left is per-tick
+    rounding of positions, link changes and transmissions seen at their exact time
+    instead of at tick boundaries, and fewer relay selection attempts between
+    triggers. Delivered counts differ from the tick engine by about as much as
+    between seeds, within 15% on the default config over 30 s. Packets that do not
+    reach their destination hop faster than in whole ticks, so up to five times as
+    many of them run into the hop limit.
+    """
+    profiled_phases = ('handle', 'advance_to', 'service', 'transmission_complete', 'waypoint_arrival', 'link_event',
+                       'predict_links', 'apply_link_events', 'send_service_broadcast_packet')
+    profiled_node_phases = ('queue_new_data_packet', 'process_time_limits', 'select_relay', 'receive',
+                            'update_traffic_table')
+
+    def __init__(self, seed, config=None, result_files=True):
+        self.events = EventQueue()
+        super().__init__(seed, config, result_files)
+
+        n = len(self.nodes)
+        self.trajectories = Trajectories.compile(self.store, self.config, until=self.config.max_sim_time)
+        self.segment = np.zeros(n, dtype=np.int64)  # Current trajectory segment of every node
+        self.seg_end = np.full(n, np.inf)  # Time of arrival at the current waypoint
+        self.seg_version = np.zeros(n, dtype=np.int64)  # Invalidates link predictions of older segments
+
+        self.in_flight = {}  # key: node index, value: (radio task, relay, token) of the pending transmission
+        self.tokens = 0
+
+        self.initialize_events()
+
+    def make_store(self):
+        return NodeStore(self.config)
+
+    def make_contact_plan(self, coordinates, velocities, waypoints):
+        return None  # Links are predicted exactly, see predict_links()
+
+    def initialize_events(self):
+        for node in self.nodes:
+            self.start_segment(node.index)
+            self.schedule_packet_generation(node)
+        if self.config.strategy == 'prophet':
+            self.events.push(0, EventType.PROPHET_AGING)
+
+        # Initial links, then the first link event of every pair
+        links_up, links_down = self.discover_links()
+        for node in self.apply_link_events(links_up, links_down):
+            self.send_service_broadcast_packet(src_node=node)
+        for index in range(len(self.nodes)):
+            self.predict_links(index, np.arange(index + 1, len(self.nodes)))
+
+    def run(self):
+        """
+        Process events until Config.max_sim_time is reached
+        """
+        print(f"{Color.GREEN}{Color.BOLD}Simulation started at:{Color.END}"
+              f" {Color.UNDERLINE}{datetime.datetime.now()}{Color.END}")
+        while not self.is_finished():
+            self.step()
+            if self.sim_time >= self.next_checkpoint:
+                self.save_checkpoint()
+
+    def is_finished(self):
+        next_time = self.events.peek_time()
+        return next_time is None or next_time > self.config.max_sim_time
+
+    def step(self):
+        """
+        Process all events scheduled for the next event time
+        """
+        time = self.events.peek_time()
+        self.advance_to(time)
+        while self.events.peek_time() == time:
+            _, event_type, data = self.events.pop()
+            self.handle(event_type, data)
+
+    def exit_handler(self):
+        self.advance_to(max(self.sim_time, self.config.max_sim_time))
+        super().exit_handler()
+
+    def advance_to(self, time):
+        self.sim_time = time
+        self.clock.time = time
+        self.metrics.observe(time)
+        n = len(self.nodes)
+        self.store.x[:n], self.store.y[:n] = self.trajectories.positions(time, segment=self.segment)
+
+    def handle(self, event_type, data):
+        if event_type == EventType.WAYPOINT_ARRIVAL:
+            self.waypoint_arrival(*data)
+        elif event_type == EventType.LINK_UP or event_type == EventType.LINK_DOWN:
+            self.link_event(event_type == EventType.LINK_UP, *data)
+        elif event_type == EventType.PACKET_GENERATION:
+            node = self.nodes[data]
+            if not node.finished:
+                # Finished nodes stop generating, like they stop running Node.update_core()
+                node.queue_new_data_packet()
+                self.schedule_packet_generation(node)
+                self.service(node)
+        elif event_type == EventType.TRANSMISSION_COMPLETE:
+            self.transmission_complete(*data)
+        elif event_type == EventType.PROPHET_AGING:
+            for node in self.nodes:
+                if not node.finished:
+                    node.prophet_age()
+            self.events.push(self.sim_time + 1_000, EventType.PROPHET_AGING)
+
+    # Mobility
+
+    def start_segment(self, index):
+        """
+        Start the current trajectory segment of node index, and schedule its end
+        """
+        self.seg_version[index] += 1
+        self.seg_end[index] = self.trajectories.segment_end(index, self.segment[index])
+        if self.seg_end[index] <= self.config.max_sim_time:
+            self.events.push(float(self.seg_end[index]), EventType.WAYPOINT_ARRIVAL, (index, int(self.seg_version[index])))
+
+    def waypoint_arrival(self, index, version):
+        if version != self.seg_version[index]:
+            return
+        self.segment[index] += 1
+        # Node state of the new segment
+        store, trajectories, segment = self.store, self.trajectories, self.segment[index]
+        store.x[index] = trajectories.x[index, segment]
+        store.y[index] = trajectories.y[index, segment]
+        store.velocity[index] = trajectories.velocity[index, segment]
+        store.heading[index] = trajectories.heading[index, segment]
+        store.waypointer[index] = trajectories.waypointer[index, segment]
+        store.finished[index] = trajectories.finished[index, segment]
+        self.start_segment(index)
+        self.predict_links(index, np.arange(len(self.nodes)))
+        self.service(self.nodes[index])
+
+    # Links
+
+    def predict_links(self, index, others):
+        """
+        Schedule the next link event between node index and each of the others, as far
+        as it happens before either node starts a new segment
+        """
+        others = others[others != index]
+        if not len(others):
+            return
+        if len(others) == 1:
+            self.predict_link(index, int(others[0]))
+            return
+        store, trajectories, segment = self.store, self.trajectories, self.segment
+        linked = np.zeros(len(self.nodes), dtype=bool)
+        linked[[node.index for node in self.nodes[index].nodes_in_range]] = True
+        linked = linked[others]
+        # Velocities of the pairs asked for only, link events predict a single pair
+        own_segment, other_segments = segment[index], segment[others]
+        times = self.sim_time + link_event_times(
+            store.x[others] - store.x[index], store.y[others] - store.y[index],
+            trajectories.vx[others, other_segments] - trajectories.vx[index, own_segment],
+            trajectories.vy[others, other_segments] - trajectories.vy[index, own_segment],
+            self.config.node_transmit_power, linked)
+        horizon = np.minimum(np.minimum(self.seg_end[others], self.seg_end[index]), self.config.max_sim_time)
+        for position in np.flatnonzero(times <= horizon).tolist():
+            other = int(others[position])
+            first, second = min(index, other), max(index, other)
+            self.events.push(float(times[position]), EventType.LINK_DOWN if linked[position] else EventType.LINK_UP,
+                             (first, second, int(self.seg_version[first]), int(self.seg_version[second])))
+
+    def predict_link(self, index, other):
+        """
+        predict_links() of a single pair
+        """
+        store, trajectories, segment = self.store, self.trajectories, self.segment
+        linked = self.nodes[other] in self.nodes[index].nodes_in_range
+        own_segment, other_segment = segment[index], segment[other]
+        time = self.sim_time + link_event_time(
+            float(store.x[other] - store.x[index]), float(store.y[other] - store.y[index]),
+            float(trajectories.vx[other, other_segment] - trajectories.vx[index, own_segment]),
+            float(trajectories.vy[other, other_segment] - trajectories.vy[index, own_segment]),
+            self.config.node_transmit_power, linked)
+        if time <= min(self.seg_end[other], self.seg_end[index], self.config.max_sim_time):
+            first, second = min(index, other), max(index, other)
+            self.events.push(float(time), EventType.LINK_DOWN if linked else EventType.LINK_UP,
+                             (first, second, int(self.seg_version[first]), int(self.seg_version[second])))
+
+    def link_event(self, link_up, first, second, first_version, second_version):
+        if first_version != self.seg_version[first] or second_version != self.seg_version[second]:
+            return
+        node_a, node_b = self.nodes[first], self.nodes[second]
+        if (node_b in node_a.nodes_in_range) == link_up:
+            return
+        key = np.array([(first << 32) | second], dtype=np.int64)
+        empty = np.empty(0, dtype=np.int64)
+        changed = self.apply_link_events(key if link_up else empty, empty if link_up else key)
+        for node in changed:
+            self.send_service_broadcast_packet(src_node=node)
+        self.predict_link(first, second)
+        for node in changed:
+            # A new neighbor is a new relay candidate, a lost one only matters if it was the relay
+            if link_up or node.radioTask is not None and node.radioTask.relay not in (None, *node.nodes_in_range):
+                self.service(node)
+
+    # Radio
+
+    def schedule_packet_generation(self, node):
+        if len(node.gen_timestamps):
+            self.events.push(node.gen_timestamps.pop(0), EventType.PACKET_GENERATION, node.index)
+
+    def service(self, node):
+        """
+        Event-driven counterpart of the radio part of Node.update_core(): make sure the
+        node is transmitting its radio task to a relay in range, if it has one
+        """
+        if node.finished:
+            return
+        node.process_time_limits()
+        if node.radioTask is None:
+            node.check_and_set_radio_task()
+        task = node.radioTask
+        if task is None:
+            return
+
+        if task.relay not in node.nodes_in_range:
+            # Deliver directly if the destination is in range, otherwise select a relay
+            task.relay = node.get_node_in_range_by_id(task.queue_item.packet.dst)
+            if task.relay is None:
+                task.relay = node.select_relay(task.queue_item.packet.dst)
+
+        if task.relay is None and len(node.queue) > 1:
+            # No relay for this packet, if other packets are waiting, try the next one (same condition as
+            # Node.update_core())
+            task.queue_item.failure_count += 1
+            if task.queue_item.failure_count > self.config.max_tx_failure:
+                # Tx failed too many times for packet, drop
+                node.metrics.failure_tx_limit += 1
+                if node.trace is not None:
+                    node.trace.record(self.sim_time, DROP_TX_LIMIT, task.queue_item.packet.id, node.index)
+            else:
+                # To the back, so that the other packets get their turn before this one again
+                node.queue_insert(task.queue_item, back=True)
+            queue_item = node.queue.pop()
+            task = node.radioTask = RadioTask(queue_item, relay=node.select_relay(queue_item.packet.dst))
+
+        if task.relay is None:
+            return  # Tried again on the next link up, waypoint arrival or queue change
+
+        in_flight = self.in_flight.get(node.index)
+        if in_flight is not None and in_flight[0] is task and in_flight[1] is task.relay:
+            return  # Already transmitting to this relay
+        self.tokens += 1
+        self.in_flight[node.index] = (task, task.relay, self.tokens)
+        self.events.push(self.sim_time + task.queue_item.packet.tx_time, EventType.TRANSMISSION_COMPLETE,
+                         (node.index, self.tokens))
+
+    def transmission_complete(self, index, token):
+        node = self.nodes[index]
+        in_flight = self.in_flight.get(index)
+        if in_flight is None or in_flight[2] != token:
+            return
+        del self.in_flight[index]
+        task, relay, _ = in_flight
+        if node.radioTask is not task or task.relay is not relay or relay not in node.nodes_in_range:
+            # Task dropped or relay lost during the transmission
+            self.service(node)
+            return
+
+        if node.trace is not None:
+            node.trace.record(self.sim_time, TRANSMITTED, task.queue_item.packet.id, index, relay.index,
+                              task.queue_item.packet.hop_count + 1)
+        relay.receive(task.queue_item.packet)
+        if relay.id != task.queue_item.packet.dst:
+            # If relay was not packet's destination, insert item back into queue
+            node.queue_insert(task.queue_item)
+        node.radioTask = None
+        node.order_queue()
+        self.service(node)
+        self.service(relay)
@@ -0,0 +1,28 @@
+import heapq
+
+"""
+Events
+
+Priority queue of simulation events for the discrete-event engine. Events at the
+same time are processed in the order they were scheduled.
+"""
+
+
+class EventQueue:
+    def __init__(self):
+        self.heap = []  # (time, seq, event_type, data)
+        self.sequence = 0  # Number of events pushed, orders events at the same time
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, time, event_type, data=None):
+        heapq.heappush(self.heap, (time, self.sequence, event_type, data))
+        self.sequence += 1
+
+    def pop(self):
+        time, _, event_type, data = heapq.heappop(self.heap)
+        return time, event_type, data
+
+    def peek_time(self):
+        return self.heap[0][0] if self.heap else None
@@ -0,0 +1,134 @@
+import bisect
+import itertools
+import math
+
+import numpy as np
+
+from core.config import Config
+
+"""
+Metrics
+
+Run-wide packet metrics, updated online when a packet is sent, delivered or
+dropped instead of being recomputed from every delivered packet at the end of a
+run. Delays and hop counts of delivered packets go into running statistics
+(Welford) and fixed-width histograms, which give quantiles. Memory does not grow
+with the number of delivered packets.
+
+Optionally, snapshots of the delivery ratio are taken every
+Config.metrics_snapshot_interval ms of simulated time, the engine saves them
+with snapshot_table() when the run finishes.
+"""
+
+
+class RunningStats:
+    """
+    Count, sum, mean and variance of a stream of values
+    """
+    __slots__ = ('count', 'total', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    def std(self):
+        variance = self.variance()
+        return None if variance is None else math.sqrt(variance)
+
+
+class Histogram:
+    """
+    Fixed-width histogram from 0 up to limit, values beyond limit go into the last
+    bin. Bins are allocated up to the largest value seen
+    """
+    def __init__(self, bin_width, limit):
+        self.bin_width = bin_width
+        self.n_bins = int(limit // bin_width) + 1
+        self.counts = []
+        self.count = 0
+
+    def add(self, value):
+        index = min(int(value // self.bin_width), self.n_bins - 1)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Return the q-quantile, interpolated linearly within its bin, None if empty
+        """
+        if self.count == 0:
+            return None
+        cumulative = list(itertools.accumulate(self.counts))
+        rank = q * self.count
+        index = min(bisect.bisect_left(cumulative, rank), len(self.counts) - 1)
+        below = cumulative[index - 1] if index > 0 else 0
+        fraction = (rank - below) / self.counts[index] if self.counts[index] else 0
+        return (index + fraction) * self.bin_width
+
+
+class Metrics:
+    def __init__(self, config=Config):
+        self.config = config
+        self.sent = 0
+        self.delivered = 0  # First arrivals at the destination
+        self.duplicates = 0
+        self.failure_hop_limit = 0
+        self.failure_tx_limit = 0
+        self.failure_queue_limit = 0
+        self.failure_time_limit = 0
+
+        self.delay = RunningStats()  # ms
+        self.hops = RunningStats()
+        self.delay_histogram = Histogram(config.metrics_delay_bin, config.max_packet_age)
+        self.hop_histogram = Histogram(1, config.max_hops + 1)
+
+        self.snapshots = []  # (time, sent, delivered, delivery ratio, mean delay in ms)
+        self.next_snapshot = math.inf if config.metrics_snapshot_interval is None \
+            else config.metrics_snapshot_interval
+
+    def packet_delivered(self, delay, hop_count):
+        self.delivered += 1
+        self.delay.add(delay)
+        self.hops.add(hop_count)
+        self.delay_histogram.add(delay)
+        self.hop_histogram.add(hop_count)
+
+    def observe(self, time):
+        """
+        Take the snapshots due up to time, call this whenever simulated time advances
+        """
+        while self.next_snapshot <= time:
+            self.snapshots.append((self.next_snapshot, self.sent, self.delivered,
+                                   self.delivered / self.sent if self.sent else None,
+                                   self.delay.mean if self.delay.count else None))
+            self.next_snapshot += self.config.metrics_snapshot_interval
+
+    def snapshot_table(self):
+        """
+        Return the snapshots as a dict of column arrays
+        """
+        columns = ('time', 'sent', 'delivered', 'delivery_ratio', 'mean_delay')
+        return {name: np.array([np.nan if value is None else value for value in values])
+                for name, values in zip(columns, zip(*self.snapshots) if self.snapshots else [()] * len(columns))}
+
+    def average(self, stats, divide_by=1):
+        if stats.count == 0:
+            return None
+        return round((stats.total / divide_by) / stats.count, self.config.granularity)
+
+    def scaled(self, value, divide_by=1):
+        return None if value is None else round(value / divide_by, self.config.granularity)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+"""
+Mobility cache
+
+Start coordinates, start velocities and waypoints of all nodes only depend on
+the seed and the mobility part of the config, so runs that differ in anything
+else (strategy, radio, traffic, ...) can share them. The same holds for the
+contact plan of a run, which additionally depends on the radio range and the
+run length. Cached arrays are stored as .npy files in a directory per key, which
+is written to a temporary directory first and then renamed into place, so
+concurrent runs never see a partial entry. Cached arrays are memory-mapped
+instead of read.
+"""
+
+# Config fields that determine the generated mobility
+MOBILITY_FIELDS = ('n_nodes', 'width', 'height', 'min_node_d', 'max_node_d', 'node_dd', 'granularity',
+                   'num_waypoints', 'h_factor', 'min_node_velocity', 'max_node_velocity')
+# Config fields that, together with the mobility, determine the contact plan
+CONTACT_FIELDS = MOBILITY_FIELDS + ('node_velocity_dd', 'node_transmit_power', 'simulation_interval', 'max_sim_time')
+# Bump when the cached arrays change for the same config and seed
+CACHE_VERSION = 1
+MOBILITY_ARRAYS = ('coordinates', 'velocities', 'waypoints')
+CONTACT_ARRAYS = ('steps', 'keys', 'up')
+
+
+def cache_key(kind, config, seed, fields):
+    values = {name: getattr(config, name) for name in fields}
+    description = json.dumps({'kind': kind, 'version': CACHE_VERSION, 'seed': seed, 'fields': values}, sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()[:24]
+
+
+def cached_arrays(config, key, names, generate):
+    """
+    Return the arrays stored under key, or the arrays returned by generate() if
+    there are none yet, and store those
+    """
+    path = os.path.join(config.mobility_cache, key)
+    if os.path.isdir(path):
+        return tuple(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in names)
+
+    arrays = generate()
+    os.makedirs(config.mobility_cache, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=config.mobility_cache, prefix='.staging-')
+    try:
+        for name, array in zip(names, arrays):
+            np.save(os.path.join(staging, f'{name}.npy'), array)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    try:
+        os.rename(staging, path)
+    except OSError:
+        # Another run cached the same arrays first
+        shutil.rmtree(staging, ignore_errors=True)
+    return arrays
+
+
+def cached_mobility(config, seed, generate):
+    """
+    Return (coordinates, velocities, waypoints) of the run from the cache, or from
+    generate() if they are not cached yet, and cache them
+    """
+    if config.mobility_cache is None or seed is None:
+        return generate()
+    return cached_arrays(config, cache_key('mobility', config, seed, MOBILITY_FIELDS), MOBILITY_ARRAYS, generate)
+
+
+def cached_contact_plan(config, seed, generate):
+    """
+    Return (steps, keys, up) of the contact plan of the run from the cache, or from
+    generate() if it is not cached yet, and cache it
+    """
+    if config.mobility_cache is None or seed is None:
+        return generate()
+    return cached_arrays(config, cache_key('contacts', config, seed, CONTACT_FIELDS), CONTACT_ARRAYS, generate)
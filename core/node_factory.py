@@ -1,4 +1,5 @@
 import random
+import numpy as np
 from core.simulator_entities import Node, Coordinate
 from core.config import Config
 import math
@@ -11,41 +12,125 @@ and the Node objects themselves
 """
 
 
-def generate_waypoint_array(start, length, h_factor, v_factor):
+def generate_waypoint_array(start, length, h_factor, v_factor, config=Config, rng=None):
     if length < 0:
         Exception('Length cannot be smaller than 0')
     if length == 0:
         return []
+    if rng is None:
+        rng = np.random.default_rng()
 
     waypoints = [start]
-    w_h = random.uniform(0, 2*math.pi)  # Random heading (rad)
-    w_d = random.uniform(Config.min_node_d, Config.max_node_d)  # Random velocity
+    w_h = rng.uniform(0, 2*math.pi)  # Random heading (rad)
+    w_d = rng.uniform(config.min_node_d, config.max_node_d)  # Random velocity
 
     while len(waypoints) < length:
-        w_h = w_h + h_factor * random.uniform(-math.pi, math.pi)
+        w_h = w_h + h_factor * rng.uniform(-math.pi, math.pi)
 
-        w_x = round(waypoints[-1].x + w_d * math.cos(w_h), Config.granularity)  # Determine waypoint x
-        w_y = round(waypoints[-1].y + w_d * math.sin(w_h), Config.granularity)  # Determine waypoint y
+        w_x = round(waypoints[-1].x + w_d * math.cos(w_h), config.granularity)  # Determine waypoint x
+        w_y = round(waypoints[-1].y + w_d * math.sin(w_h), config.granularity)  # Determine waypoint y
 
-        if w_x < 0 or w_x > Config.width or w_y < 0 or w_y > Config.height:
+        if w_x < 0 or w_x > config.width or w_y < 0 or w_y > config.height:
             # Point outside of area, readjust heading and try again
             continue
 
         waypoints.append(Coordinate(w_x, w_y))  # Add waypoint to array
 
-        w_h = w_h + (h_factor * random.uniform(-math.pi, math.pi))
+        w_h = w_h + (h_factor * rng.uniform(-math.pi, math.pi))
 
-        w_d = min(max(w_d + v_factor * random.uniform(-0.5 * Config.node_dd, 0.5 * Config.node_dd), Config.min_node_d), Config.max_node_d)
+        w_d = min(max(w_d + v_factor * rng.uniform(-0.5 * config.node_dd, 0.5 * config.node_dd), config.min_node_d), config.max_node_d)
 
     return waypoints
 
 
-def generate_coordinate_array(length, max_x, max_y, min_x=0, min_y=0):
-    return [(generate_coordinate(max_x, max_y, min_x, min_y)) for _ in range(length)]
-
-
-def generate_coordinate(max_x, max_y, min_x=0, min_y=0):
-    return Coordinate(random.randint(min_x, max_x), random.randint(min_y, max_y))
+def generate_waypoint_arrays(starts, length, h_factor, v_factor, config=Config, rngs=None):
+    """
+    Vectorized generate_waypoint_array for many nodes at once. starts is an (n, 2)
+    array of start coordinates and rngs holds the random generator of every node.
+    Returns an (n, length, 2) array, row i holds the same waypoints as
+    generate_waypoint_array(starts[i], ..., rng=rngs[i]) would.
+
+    The random walks of all nodes advance together, one waypoint per iteration;
+    nodes whose candidate point falls outside the area retry in the next
+    iteration while the others move on.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    n = len(starts)
+    if rngs is None:
+        rngs = [np.random.default_rng() for _ in range(n)]
+    waypoints = np.empty((n, max(length, 0), 2))
+    if length <= 0 or n == 0:
+        return waypoints
+
+    # Uniform draws of every node from its own generator, consumed in the scalar draw order
+    draws = np.array([rng.random(3 * length) for rng in rngs])
+    drawn = np.zeros(n, dtype=np.int64)
+
+    def uniform(rows, low, high):
+        nonlocal draws
+        if drawn[rows].max(initial=0) >= draws.shape[1]:
+            draws = np.hstack([draws, np.array([rng.random(length) for rng in rngs])])
+        values = low + (high - low) * draws[rows, drawn[rows]]
+        drawn[rows] += 1
+        return values
+
+    everyone = np.arange(n)
+    waypoints[:, 0] = starts
+    w_h = uniform(everyone, 0, 2*math.pi)  # Random heading (rad)
+    w_d = uniform(everyone, config.min_node_d, config.max_node_d)  # Random velocity
+    count = np.ones(n, dtype=np.int64)
+
+    while True:
+        active = np.flatnonzero(count < length)
+        if not len(active):
+            return waypoints
+        w_h[active] = w_h[active] + h_factor * uniform(active, -math.pi, math.pi)
+
+        last = waypoints[active, count[active] - 1]
+        w_x = np.round(last[:, 0] + w_d[active] * np.cos(w_h[active]), config.granularity)  # Determine waypoint x
+        w_y = np.round(last[:, 1] + w_d[active] * np.sin(w_h[active]), config.granularity)  # Determine waypoint y
+
+        # Points outside of area are dropped, their nodes readjust heading and try again
+        inside = (w_x >= 0) & (w_x <= config.width) & (w_y >= 0) & (w_y <= config.height)
+        accepted = active[inside]
+        waypoints[accepted, count[accepted], 0] = w_x[inside]
+        waypoints[accepted, count[accepted], 1] = w_y[inside]
+        count[accepted] += 1
+
+        w_h[accepted] = w_h[accepted] + (h_factor * uniform(accepted, -math.pi, math.pi))
+
+        w_d[accepted] = np.minimum(np.maximum(w_d[accepted] + v_factor * uniform(accepted, -0.5 * config.node_dd, 0.5 * config.node_dd),
+                                              config.min_node_d), config.max_node_d)
+
+
+def generate_mobility(config, rngs, num_waypoints=None, h_factor=None, v_factor=None, starts=None):
+    """
+    Generate the start coordinates, start velocities and waypoints of one node per
+    generator in rngs, or of one node per start coordinate in starts. Returns an
+    (n, 2) array of coordinates, an (n,) array of velocities and an
+    (n, num_waypoints, 2) array of waypoints.
+    """
+    if num_waypoints is None: num_waypoints = config.num_waypoints
+    if h_factor is None: h_factor = config.h_factor
+    if v_factor is None: v_factor = config.h_factor
+    if starts is None:
+        starts = [generate_coordinate(config.width, config.height, rng=rng) for rng in rngs]
+    coordinates = np.array([(start.x, start.y) for start in starts], dtype=float).reshape(-1, 2)
+    velocities = np.array([rng.uniform(config.min_node_velocity, config.max_node_velocity) for rng in rngs])
+    waypoints = generate_waypoint_arrays(coordinates, num_waypoints, h_factor, v_factor, config, rngs)
+    return coordinates, velocities, waypoints
+
+
+def generate_coordinate_array(length, max_x, max_y, min_x=0, min_y=0, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    return [(generate_coordinate(max_x, max_y, min_x, min_y, rng)) for _ in range(length)]
+
+
+def generate_coordinate(max_x, max_y, min_x=0, min_y=0, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    return Coordinate(int(rng.integers(min_x, max_x, endpoint=True)), int(rng.integers(min_y, max_y, endpoint=True)))
 
 
 def generate_nodes(count, max_x, max_y, num_waypoints, h_factor, v_factor, min_x=0, min_y=0):
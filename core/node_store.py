@@ -0,0 +1,173 @@
+import numpy as np
+
+from core.config import Config
+from core.simulator_entities import Node, Coordinate, Vector
+from core.random_streams import NodeStreams
+
+"""
+Node Store
+
+Struct-of-arrays storage for the mobility state of all nodes (positions, headings,
+velocities, waypoints and waypoint indices). NodeStore.step() advances every node
+with a handful of array operations instead of one Node.update_pos() call per node,
+ArrayNode objects are thin views on one row of the store.
+"""
+
+
+class NodeStore:
+    def __init__(self, config=Config, capacity=64):
+        self.config = config
+        self.size = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.velocity = np.zeros(capacity)
+        self.heading = np.zeros(capacity)
+        self.waypointer = np.zeros(capacity, dtype=np.int64)
+        self.n_waypoints = np.zeros(capacity, dtype=np.int64)
+        self.finished = np.zeros(capacity, dtype=bool)
+        self.waypoints = np.full((capacity, 0, 2), np.nan)  # (node, waypoint, x/y), padded with nan
+        self.rngs = []  # Mobility random generator of every row
+
+        # Grid cell of every node at the last call to changed_cells()
+        self.cell_x = np.zeros(capacity, dtype=np.int64)
+        self.cell_y = np.zeros(capacity, dtype=np.int64)
+
+    def allocate(self, rng):
+        """
+        Reserve a row for a new node that draws velocity changes from rng, and return
+        its index
+        """
+        if self.size == len(self.x):
+            self._grow(2 * len(self.x))
+        self.rngs.append(rng)
+        self.size += 1
+        return self.size - 1
+
+    def _grow(self, capacity):
+        extra = capacity - len(self.x)
+        for name in ('x', 'y', 'velocity', 'heading', 'waypointer', 'n_waypoints', 'finished', 'cell_x', 'cell_y'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros(extra, dtype=array.dtype)]))
+        self.waypoints = np.concatenate([self.waypoints, np.full((extra,) + self.waypoints.shape[1:], np.nan)])
+
+    def set_waypoints(self, row, waypoints):
+        """
+        Set the waypoints of row, a list of Coordinates or an (n, 2) array
+        """
+        if len(waypoints) > self.waypoints.shape[1]:
+            padding = len(waypoints) - self.waypoints.shape[1]
+            self.waypoints = np.pad(self.waypoints, ((0, 0), (0, padding), (0, 0)), constant_values=np.nan)
+        self.waypoints[row, :] = np.nan
+        if len(waypoints):
+            self.waypoints[row, :len(waypoints)] = waypoints if isinstance(waypoints, np.ndarray) \
+                else [(w.x, w.y) for w in waypoints]
+        self.n_waypoints[row] = len(waypoints)
+
+    def step(self, duration=None):
+        """
+        Vectorized equivalent of Node.update_pos() for all nodes in the store.
+
+        Nodes within one velocity of their current waypoint advance to the next
+        waypoint with a jittered velocity (drawn from the row's generator, like the
+        scalar update) and a new heading, nodes that reach their last waypoint finish.
+        """
+        if duration is None: duration = self.config.simulation_interval
+        n = self.size
+        x, y = self.x[:n], self.y[:n]
+        velocity, heading = self.velocity[:n], self.heading[:n]
+        waypointer, finished = self.waypointer[:n], self.finished[:n]
+        rows = np.arange(n)
+
+        active = ~finished & (self.n_waypoints[:n] > 0)
+        target = self.waypoints[rows, np.minimum(waypointer, self.waypoints.shape[1] - 1)]
+        distance = np.hypot(target[:, 0] - x, target[:, 1] - y)
+
+        arrived = active & (distance < velocity)
+        last = arrived & (waypointer >= self.n_waypoints[:n] - 1)
+        finished[last] = True
+        advance = arrived & ~last
+        waypointer[advance] += 1
+
+        for row in np.flatnonzero(advance):
+            velocity[row] = min(max(self.config.min_node_velocity, velocity[row]
+                                    + self.rngs[row].uniform(-0.5 * self.config.node_velocity_dd
+                                                             , 0.5 * self.config.node_velocity_dd)), self.config.max_node_velocity)
+
+        target = self.waypoints[rows[advance], waypointer[advance]]
+        heading[advance] = np.arctan2(target[:, 1] - y[advance], target[:, 0] - x[advance])
+
+        # Nodes exactly one velocity away from their waypoint move by that distance (see Node.update_pos)
+        step_velocity = np.where(~arrived & (distance == velocity), distance, velocity)
+        moving = active & ~last
+        duration = duration / 1_000  # ms to s
+        x[moving] = np.round(x[moving] + step_velocity[moving] * duration * np.cos(heading[moving]), self.config.granularity)
+        y[moving] = np.round(y[moving] + step_velocity[moving] * duration * np.sin(heading[moving]), self.config.granularity)
+
+    def changed_cells(self, cell_size):
+        """
+        Return the rows of all nodes that moved to another grid cell since the last call
+        """
+        n = self.size
+        cell_x = (self.x[:n] // cell_size).astype(np.int64)
+        cell_y = (self.y[:n] // cell_size).astype(np.int64)
+        changed = np.flatnonzero((cell_x != self.cell_x[:n]) | (cell_y != self.cell_y[:n]))
+        self.cell_x[:n] = cell_x
+        self.cell_y[:n] = cell_y
+        return changed
+
+
+class ArrayNode(Node):
+    """
+    Node whose mobility state lives in a row of a NodeStore. Reading coordinate or
+    vector returns a snapshot, assigning one writes it back to the store.
+    """
+    def __init__(self, store: NodeStore, id: str, coordinate, velocity, waypoints=None, config=None, streams=None,
+                 metrics=None, clock=None):
+        if streams is None:
+            streams = NodeStreams(None, 0)
+        self.store = store
+        self.row = store.allocate(streams.mobility)
+        super().__init__(id, coordinate, velocity, waypoints, config, streams, metrics, clock)
+
+    @property
+    def coordinate(self):
+        return Coordinate(float(self.store.x[self.row]), float(self.store.y[self.row]))
+
+    @coordinate.setter
+    def coordinate(self, coordinate):
+        self.store.x[self.row] = coordinate.x
+        self.store.y[self.row] = coordinate.y
+
+    @property
+    def vector(self):
+        return Vector(float(self.store.velocity[self.row]), float(self.store.heading[self.row]))
+
+    @vector.setter
+    def vector(self, vector):
+        self.store.velocity[self.row] = vector.velocity
+        self.store.heading[self.row] = vector.heading
+
+    @property
+    def waypointer(self):
+        return int(self.store.waypointer[self.row])
+
+    @waypointer.setter
+    def waypointer(self, waypointer):
+        self.store.waypointer[self.row] = waypointer
+
+    @property
+    def finished(self):
+        return bool(self.store.finished[self.row])
+
+    @finished.setter
+    def finished(self, finished):
+        self.store.finished[self.row] = finished
+
+    @property
+    def waypoints(self):
+        return [Coordinate(float(x), float(y))
+                for x, y in self.store.waypoints[self.row, :self.store.n_waypoints[self.row]]]
+
+    @waypoints.setter
+    def waypoints(self, waypoints):
+        self.store.set_waypoints(self.row, waypoints)
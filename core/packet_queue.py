@@ -0,0 +1,154 @@
+import heapq
+import math
+
+"""
+Packet Queue
+
+Forwarding queue of a node with two heap indices over the same queue items:
+- an age index ordered by packet creation time, for SHLI eviction and expiry of
+  packets older than Config.max_packet_age
+- a priority index ordered by (priority field, strategy key, insertion order), for
+  picking the next packet to transmit
+
+Removed items are dropped from the heaps lazily, so insert, remove, pop and
+eviction are all O(log n). When the strategy keys of some destinations change,
+only the items to those destinations get a new priority entry, the old entries
+are dropped lazily like removed items.
+
+An item pushed to the back, like a packet put back after no relay was found for
+it, is transmitted after all items of its priority until the next call to
+reprioritize(), so that the other packets get their turn first.
+"""
+
+
+class PacketQueue:
+    def __init__(self, key=None):
+        self.key = key  # Strategy key of a queue item, lower is transmitted first
+        self.items = {}  # key: sequence number, value: queue item
+        self.seqs = {}  # key: packet id, value: sequence number
+        self.destinations = {}  # key: destination id, value: set of sequence numbers
+        self.age_heap = []  # (c_time, seq)
+        self.priority_heap = []  # (-prio, strategy key, seq)
+        self.priority_entries = {}  # key: sequence number, value: its current entry in priority_heap
+        self.at_back = set()  # Sequence numbers of the items pushed to the back, until reprioritize()
+        self.sequence = 0  # Number of items pushed
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, packet_id):
+        return packet_id in self.seqs
+
+    def __iter__(self):
+        """
+        Iterate over the queue items in transmission order, O(n log n)
+        """
+        return iter([self.items[entry[-1]] for entry in sorted(self.priority_heap) if self.is_current(entry)])
+
+    def priority(self, queue_item, seq):
+        return -queue_item.prio, self.key(queue_item) if self.key is not None else 0, seq
+
+    def is_current(self, entry):
+        return self.priority_entries.get(entry[-1]) is entry
+
+    def push_priority(self, queue_item, seq, back=False):
+        entry = (-queue_item.prio, math.inf, seq) if back else self.priority(queue_item, seq)
+        self.priority_entries[seq] = entry
+        heapq.heappush(self.priority_heap, entry)
+
+    def push(self, queue_item, back=False):
+        """
+        Add queue_item, with back behind all items of its priority until the next
+        reprioritize()
+        """
+        if queue_item.packet.id in self.seqs:
+            raise ValueError(f'Packet {queue_item.packet.id} is already in the queue')
+        seq = self.sequence
+        self.sequence += 1
+        self.items[seq] = queue_item
+        self.seqs[queue_item.packet.id] = seq
+        self.destinations.setdefault(queue_item.packet.dst, set()).add(seq)
+        heapq.heappush(self.age_heap, (queue_item.packet.c_time, seq))
+        # Without a strategy key, later sequence numbers are behind already
+        back = back and self.key is not None
+        if back:
+            self.at_back.add(seq)
+        self.push_priority(queue_item, seq, back)
+
+    def remove(self, queue_item):
+        seq = self.seqs.pop(queue_item.packet.id)
+        del self.items[seq]
+        del self.priority_entries[seq]
+        self.at_back.discard(seq)
+        same_destination = self.destinations[queue_item.packet.dst]
+        same_destination.discard(seq)
+        if not same_destination:
+            del self.destinations[queue_item.packet.dst]
+        self.compact()
+
+    def peek(self):
+        """
+        Return the queue item that is transmitted next, None if the queue is empty
+        """
+        while self.priority_heap and not self.is_current(self.priority_heap[0]):
+            heapq.heappop(self.priority_heap)
+        if not self.priority_heap:
+            return None
+        return self.items[self.priority_heap[0][-1]]
+
+    def pop(self):
+        queue_item = self.peek()
+        if queue_item is None:
+            raise IndexError('pop from empty queue')
+        self.remove(queue_item)
+        return queue_item
+
+    def oldest(self):
+        """
+        Return the queue item with the oldest packet, None if the queue is empty
+        """
+        while self.age_heap and self.age_heap[0][1] not in self.items:
+            heapq.heappop(self.age_heap)
+        if not self.age_heap:
+            return None
+        return self.items[self.age_heap[0][1]]
+
+    def expire(self, c_time):
+        """
+        Remove and return all queue items with packets created before c_time
+        """
+        expired = []
+        while True:
+            queue_item = self.oldest()
+            if queue_item is None or queue_item.packet.c_time >= c_time:
+                return expired
+            self.remove(queue_item)
+            expired.append(queue_item)
+
+    def reprioritize(self, destinations=None):
+        """
+        Recompute the strategy key of the items to the given destinations (all items
+        by default), call this when their keys changed. Items pushed to the back
+        return to their place as well. O(k log n) for k items
+        """
+        at_back, self.at_back = self.at_back, set()
+        if destinations is None:
+            self.priority_entries = {seq: self.priority(queue_item, seq) for seq, queue_item in self.items.items()}
+            self.priority_heap = list(self.priority_entries.values())
+            heapq.heapify(self.priority_heap)
+            return
+        seqs = set(at_back)
+        for destination in destinations:
+            seqs.update(self.destinations.get(destination, ()))
+        for seq in seqs:
+            self.push_priority(self.items[seq], seq)
+        self.compact()
+
+    def compact(self):
+        # Rebuild the heaps once removed entries dominate them
+        if len(self.age_heap) > 2 * len(self.items) + 32:
+            self.age_heap = [entry for entry in self.age_heap if entry[1] in self.items]
+            heapq.heapify(self.age_heap)
+        if len(self.priority_heap) > 2 * len(self.items) + 32:
+            self.priority_heap = [entry for entry in self.priority_heap if self.is_current(entry)]
+            heapq.heapify(self.priority_heap)
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+"""
+Packet trace
+
+Binary log of every data packet event of a run: creation, every hop transmission,
+delivery, duplicate delivery and drops with their reason. Events are recorded
+into a preallocated buffer of fixed size records and written to the trace file a
+chunk at a time, optionally on a background thread, so recording an event costs
+no console or file I/O.
+
+A trace file is a plain sequence of TRACE_DTYPE records in recording order, read
+it with load_trace(). Node and peer are node indices, -1 if not applicable.
+"""
+
+# Event types
+CREATED = 0  # node: source, peer: destination
+TRANSMITTED = 1  # node: sender, peer: receiver, hop_count: hops of the packet at the receiver
+DELIVERED = 2  # node: destination, first arrival only
+DUPLICATE = 3  # node: destination, every later arrival
+DROP_HOP_LIMIT = 4
+DROP_TIME_LIMIT = 5
+DROP_TX_LIMIT = 6
+DROP_QUEUE_LIMIT = 7
+
+TRACE_DTYPE = np.dtype([
+    ('time', np.float64),  # Simulation time in ms
+    ('event', np.uint8),
+    ('packet', np.int64),
+    ('node', np.int32),
+    ('peer', np.int32),
+    ('hop_count', np.int16),
+])
+
+CHUNK_SIZE = 1 << 16  # Records per chunk
+
+
+class PacketTrace:
+    def __init__(self, path, chunk_size=CHUNK_SIZE, background=False, resume_at=None):
+        self.path = path
+        if resume_at is None:
+            self.file = open(path, 'wb')
+        else:
+            # Continue a trace from a checkpoint, events written after the checkpoint are dropped
+            self.file = open(path, 'r+b')
+            self.file.truncate(resume_at)
+            self.file.seek(resume_at)
+        self.chunk_size = chunk_size
+        self.buffer = np.empty(chunk_size, dtype=TRACE_DTYPE)
+        self.size = 0
+        self.chunks = None
+        self.writer = None
+        if background:
+            # Full chunks are handed to a writer thread, None stops it
+            self.chunks = queue.Queue()
+            self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+            self.writer.start()
+
+    def record(self, time, event, packet, node, peer=-1, hop_count=0):
+        self.buffer[self.size] = (time, event, packet, node, peer, hop_count)
+        self.size += 1
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the recorded events, or hand them to the writer thread
+        """
+        if self.size == 0:
+            return
+        if self.chunks is not None:
+            self.chunks.put(self.buffer[:self.size])
+            self.buffer = np.empty(self.chunk_size, dtype=TRACE_DTYPE)
+        else:
+            self.buffer[:self.size].tofile(self.file)
+        self.size = 0
+
+    def write_chunks(self):
+        while (chunk := self.chunks.get()) is not None:
+            chunk.tofile(self.file)
+            self.chunks.task_done()
+
+    def sync(self):
+        """
+        Write all recorded events to the file and return its size
+        """
+        self.flush()
+        if self.chunks is not None:
+            self.chunks.join()
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        if self.writer is not None:
+            self.chunks.put(None)
+            self.writer.join()
+        self.file.close()
+
+
+def load_trace(path):
+    """
+    Return the events of a trace file as a structured array, memory-mapped
+    """
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=TRACE_DTYPE)  # An empty file cannot be mapped
+    return np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+
+
+def packet_delays(trace):
+    """
+    Return the packet ids, delays (ms) and hop counts of all delivered packets
+    """
+    created = trace[trace['event'] == CREATED]
+    delivered = trace[trace['event'] == DELIVERED]
+    order = np.argsort(created['packet'])
+    origin = order[np.searchsorted(created['packet'], delivered['packet'], sorter=order)]
+    return delivered['packet'], delivered['time'] - created['time'][origin], delivered['hop_count']
+
+
+def packet_paths(trace):
+    """
+    Return the hops of every packet as (sender, receiver) node indices in
+    transmission order, key: packet id. Copies of a packet kept by earlier relays
+    can be transmitted again, so hops are edges and not a single path
+    """
+    paths = {}
+    for event, packet, node, peer in zip(trace['event'].tolist(), trace['packet'].tolist(),
+                                         trace['node'].tolist(), trace['peer'].tolist()):
+        if event == CREATED:
+            paths[packet] = []
+        elif event == TRANSMITTED:
+            paths.setdefault(packet, []).append((node, peer))
+    return paths
@@ -0,0 +1,115 @@
+import functools
+import time
+
+import numpy as np
+
+"""
+Profiling
+
+Per-phase timing of a run. When profiling is enabled, the engine replaces the
+methods of every phase (on the engine and on every node) with timed wrappers,
+the same way strategies are bound at construction; when it is disabled nothing
+is wrapped and the simulation loop runs without any profiling code.
+
+Wrappers record the time spent in, and the number of calls of, every phase.
+Times are inclusive: a receive() inside a broadcast counts towards both. At the
+end of every tick the tick's phase times and calls become one row of the
+timeline, and are added to the run totals. restore() puts the original methods
+back once the run is done.
+"""
+
+
+def unwrapped(state):
+    """
+    Return a copy of an instance dict with timed wrappers replaced by the methods
+    they wrap
+    """
+    return {name: getattr(value, '__wrapped__', value) if callable(value) else value
+            for name, value in state.items()}
+
+
+class Profiler:
+    def __init__(self):
+        self.tick_times = {}  # key: phase, value: s spent in the current tick
+        self.tick_calls = {}  # key: phase, value: calls in the current tick
+        self.total_times = {}
+        self.total_calls = {}
+        self.timeline = []  # (sim_time, tick_times, tick_calls) per tick
+        self.replaced = []  # (target, name, instance attribute the wrapper replaced, or None)
+
+    def wrap(self, phase, function):
+        """
+        Return function, timed as phase
+        """
+        times, calls, perf_counter = self.tick_times, self.tick_calls, time.perf_counter
+        times.setdefault(phase, 0.0)
+        calls.setdefault(phase, 0)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[phase] += perf_counter() - started
+                calls[phase] += 1
+        return timed
+
+    def instrument(self, target, names, prefix=''):
+        """
+        Replace the named methods of target with timed wrappers. Phases are named
+        after the bound function, so strategy methods get their own phase
+        """
+        for name in names:
+            method = getattr(target, name)
+            self.replace(target, name, self.wrap(prefix + method.__name__, method))
+
+    def replace(self, target, name, function):
+        """
+        Set function as attribute name of target, until restore()
+        """
+        self.replaced.append((target, name, vars(target).get(name)))
+        setattr(target, name, function)
+
+    def restore(self):
+        """
+        Put back what the wrappers replaced: bound strategy methods are set again,
+        other methods are looked up on the class again
+        """
+        for target, name, previous in reversed(self.replaced):
+            if previous is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, previous)
+        self.replaced = []
+
+    def end_tick(self, sim_time):
+        self.timeline.append((sim_time, dict(self.tick_times), dict(self.tick_calls)))
+        for phase in self.tick_times:
+            self.total_times[phase] = self.total_times.get(phase, 0.0) + self.tick_times[phase]
+            self.total_calls[phase] = self.total_calls.get(phase, 0) + self.tick_calls[phase]
+            self.tick_times[phase] = 0.0
+            self.tick_calls[phase] = 0
+
+    def table(self):
+        """
+        Return the run totals as a table, slowest phase first
+        """
+        ticks = max(len(self.timeline), 1)
+        lines = [f"{'Phase':<36} {'Total (s)':>10} {'Calls':>10} {'us/call':>10} {'Calls/tick':>11}"]
+        for phase in sorted(self.total_times, key=self.total_times.get, reverse=True):
+            seconds, calls = self.total_times[phase], self.total_calls[phase]
+            lines.append(f"{phase:<36} {seconds:>10.3f} {calls:>10} "
+                         f"{seconds / calls * 1e6 if calls else 0:>10.1f} {calls / ticks:>11.1f}")
+        return '\n'.join(lines)
+
+    def write_timeline(self, path):
+        """
+        Write the timeline as an .npz file of columns: sim_time, and the time
+        (<phase>_s) and calls (<phase>_calls) of every phase, one row per tick
+        """
+        columns = {'sim_time': np.array([row[0] for row in self.timeline], dtype=float)}
+        for phase in self.total_times:
+            columns[f'{phase}_s'] = np.array([row[1][phase] for row in self.timeline], dtype=float)
+            columns[f'{phase}_calls'] = np.array([row[2][phase] for row in self.timeline], dtype=np.int64)
+        np.savez(path, **columns)
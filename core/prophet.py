@@ -0,0 +1,128 @@
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+from core.config import Config
+
+"""
+PRoPHET
+
+Delivery predictability table backed by a dense NumPy vector indexed by node
+index. Aging is lazy: instead of multiplying every entry by Config.prophet_gamma
+once per simulated second, the table only counts aging steps, and every entry
+remembers how many steps were applied to it. Entries are brought up to date when
+they are read, by multiplying them with gamma once per missed step (instead of
+with gamma ** steps, which rounds differently), so values are identical to eager
+aging.
+
+Aging multiplies every predictability by the same factor, so it does not change
+their order. rank() orders entries like their predictabilities without depending
+on the aging steps, ranks only change when an encounter raises a predictability.
+"""
+
+
+class ProphetTable(Mapping):
+    def __init__(self, node_indices, gamma=None):
+        self.node_indices = node_indices  # key: node_id, value: node index, shared between all tables
+        self.gamma = Config.prophet_gamma if gamma is None else gamma
+        self.age_count = 0  # Number of aging steps the table went through
+        self.values = np.zeros(len(node_indices))  # Predictability per node index, as of aged_at
+        self.aged_at = np.zeros(len(node_indices), dtype=np.int64)  # age_count at which each value was last aged
+        # Sort key of every predictability that does not change with aging, see rank()
+        self.ranks = np.full(len(node_indices), -np.inf)
+        self.changed = np.zeros(len(node_indices), dtype=bool)  # Entries raised by encounters since take_changed()
+        self.any_changed = False
+
+    def age(self):
+        self.age_count += 1
+
+    def __getitem__(self, node_id):
+        index = self.node_indices[node_id]
+        value = float(self.values[index])
+        steps = self.age_count - int(self.aged_at[index])
+        if steps:
+            for _ in range(steps):
+                value = value * self.gamma
+            self.values[index] = value
+            self.aged_at[index] = self.age_count
+        return value
+
+    def __setitem__(self, node_id, value):
+        index = self.node_indices[node_id]
+        self.values[index] = value
+        self.aged_at[index] = self.age_count
+        self.ranks[index] = math.log(value) - self.age_count * math.log(self.gamma) if value > 0 else -math.inf
+        self.changed[index] = True
+        self.any_changed = True
+
+    def __iter__(self):
+        return iter(self.node_indices)
+
+    def __len__(self):
+        return len(self.node_indices)
+
+    def __contains__(self, node_id):
+        return node_id in self.node_indices
+
+    def rank(self, node_id):
+        """
+        Sort key of the predictability of node_id, higher is more likely. Unlike
+        the predictability itself, it does not change when the table ages
+        """
+        return float(self.ranks[self.node_indices[node_id]])
+
+    def take_changed(self, node_ids):
+        """
+        Return those of node_ids whose predictability was raised by an encounter
+        since the last call, and start tracking changes anew
+        """
+        if not self.any_changed:
+            return []
+        changed = [node_id for node_id in node_ids if self.changed[self.node_indices[node_id]]]
+        self.changed[:] = False
+        self.any_changed = False
+        return changed
+
+    def vector(self):
+        """
+        Return all predictabilities, aged up to date, as a read-only array
+        """
+        # Only nonzero entries that are behind are aged, sorted by the steps they missed: every
+        # multiplication applies to the entries that are still behind after the previous ones
+        steps = self.age_count - self.aged_at
+        behind = np.flatnonzero((steps > 0) & (self.values != 0))
+        if len(behind):
+            behind = behind[np.argsort(steps[behind], kind='stable')]
+            values = self.values[behind]
+            done = 0
+            for gap, start in zip(*np.unique(steps[behind], return_index=True)):
+                for _ in range(int(gap) - done):
+                    values[start:] *= self.gamma
+                done = int(gap)
+            self.values[behind] = values
+        self.aged_at[:] = self.age_count
+        vector = self.values.view()
+        vector.flags.writeable = False
+        return vector
+
+    def encounter(self, src_id, src_vector, own_id, p_init=None, beta=None):
+        """
+        PRoPHET update on meeting src: raise the predictability of src, then update all
+        other nodes transitively with the predictabilities src_vector of src
+        """
+        if p_init is None: p_init = Config.prophet_p_init
+        if beta is None: beta = Config.prophet_beta
+        values = self.vector().copy()
+        src, own = self.node_indices[src_id], self.node_indices[own_id]
+        values[src] = values[src] + (1 - values[src]) * p_init
+
+        # src_vector holds 0 for src itself, so values[src] stays fixed during the transitive update
+        updated = values + (1 - values) * values[src] * src_vector * beta
+        updated[own] = values[own]
+        # Predictability relative to the aging so far, only raised entries get a new rank
+        raised = updated != self.values
+        self.ranks[raised] = np.log(updated[raised]) - self.age_count * math.log(self.gamma)
+        self.changed |= raised
+        self.any_changed = True
+        self.values = updated
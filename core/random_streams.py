@@ -0,0 +1,38 @@
+import numpy as np
+
+"""
+Random streams
+
+Every subsystem of a run draws from its own NumPy generator. Generators are
+derived from the run seed and a fixed key, the same way SeedSequence.spawn()
+derives child sequences, so a stream only depends on the seed and its key: not
+on the number of nodes, nor on the order in which streams are created or used.
+"""
+
+# Stream keys
+IDS = 0  # Node id assignment
+NODES = 1  # Per node streams, keyed (NODES, node index, subsystem)
+
+# Node subsystems
+MOBILITY = 0  # Velocity changes during the run
+TRAFFIC = 1  # Packet generation times and destinations
+RELAY = 2  # Relay choice of the random strategy
+WAYPOINTS = 3  # Start position, start velocity and waypoints, all generated (or loaded) before the run
+
+
+def generator(seed, *key):
+    """
+    Return the generator of stream key of the run with the given seed, a seed of
+    None draws fresh entropy from the OS
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+class NodeStreams:
+    __slots__ = ('mobility', 'traffic', 'relay', 'waypoints')
+
+    def __init__(self, seed, index):
+        self.mobility = generator(seed, NODES, index, MOBILITY)
+        self.traffic = generator(seed, NODES, index, TRAFFIC)
+        self.relay = generator(seed, NODES, index, RELAY)
+        self.waypoints = generator(seed, NODES, index, WAYPOINTS)
@@ -0,0 +1,178 @@
+import contextlib
+import glob
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, compaction is then not guarded against concurrent compactions
+    fcntl = None
+
+"""
+Results store
+
+Columnar store of run results. Every row holds all config fields, the seed and
+the metrics of one run. Runs append rows as small .npz part files with unique names
+that sort by the time they were written, so any number of processes can append
+at the same time. compact() merges the parts into a single results.npz, under a
+file lock, and read() returns all rows as one dict of column arrays, in the order
+they were appended. read() compacts and loads under the same lock, so a
+concurrent compaction cannot remove parts it is reading.
+
+Every file is written to a temporary file first and then renamed into place, so
+readers never see a partial file. Columns hold numbers (None becomes nan) or
+strings (None becomes ''). A part in which a column only holds None takes the
+type of that column in the other parts when they are merged.
+"""
+
+COMPACTED = 'results.npz'
+LOCK = '.lock'
+
+
+def to_column(values):
+    """
+    Turn a list of row values into a column array without Python objects
+    """
+    if values and all(isinstance(value, (bool, np.bool_)) for value in values):
+        return np.array(values, dtype=bool)
+    # Booleans mixed with None are stored as numbers, so that None is nan like in every numeric column
+    if all(value is None or isinstance(value, (bool, int, float, np.number, np.bool_)) for value in values):
+        if None in values or any(isinstance(value, (float, np.floating)) for value in values):
+            return np.array([np.nan if value is None else value for value in values], dtype=float)
+        return np.array(values, dtype=np.int64)
+    return np.array(['' if value is None else str(value) for value in values])
+
+
+def empty_column(like, length):
+    """
+    Column of missing values, for rows written before a column existed
+    """
+    if like.dtype.kind in 'US':
+        return np.full(length, '', dtype=like.dtype)
+    return np.full(length, np.nan)
+
+
+def is_missing(column):
+    """
+    Whether every value of column is missing
+    """
+    if column.dtype.kind in 'US':
+        return not np.any(column != '')
+    return column.dtype.kind == 'f' and bool(np.all(np.isnan(column)))
+
+
+def cast_column(column, like):
+    """
+    Encode the values of column like the column like, so that missing values stay
+    missing instead of becoming the string 'nan'
+    """
+    if like.dtype.kind in 'US' and column.dtype.kind not in 'US':
+        missing = np.isnan(column) if column.dtype.kind == 'f' else np.zeros(len(column), dtype=bool)
+        return np.where(missing, '', column.astype(str))
+    if like.dtype.kind not in 'US' and column.dtype.kind in 'US' and is_missing(column):
+        return empty_column(like, len(column))
+    return column
+
+
+def concatenate(tables):
+    """
+    Concatenate tables (dicts of equally long columns), missing columns are filled
+    with missing values
+    """
+    tables = [table for table in tables if table]
+    names = list(dict.fromkeys(name for table in tables for name in table))
+    lengths = [len(next(iter(table.values()))) for table in tables]
+    result = {}
+    for name in names:
+        # The first column that holds any values decides the type
+        columns = [table[name] for table in tables if name in table]
+        like = next((column for column in columns if not is_missing(column)), columns[0])
+        result[name] = np.concatenate([cast_column(table[name], like) if name in table else empty_column(like, length)
+                                       for table, length in zip(tables, lengths)])
+    return result
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, rows):
+        """
+        Append one row (a dict) or a list of rows as a new part file
+        """
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows:
+            return
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        # Nanosecond timestamp first so that parts sort in append order, uuid for uniqueness
+        self.write(f'part-{time.time_ns():020d}-{uuid.uuid4().hex}.npz',
+                   {name: to_column([row.get(name) for row in rows]) for name in names})
+
+    def write(self, filename, table):
+        os.makedirs(self.path, exist_ok=True)
+        file, temporary = tempfile.mkstemp(dir=self.path, prefix='.tmp-', suffix='.npz')
+        try:
+            with os.fdopen(file, 'wb') as stream:
+                np.savez(stream, **table)
+            os.replace(temporary, os.path.join(self.path, filename))
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.npz')))
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Hold the store's file lock, only one process at a time merges or removes parts
+        """
+        with open(os.path.join(self.path, LOCK), 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def compact(self):
+        """
+        Merge all part files into the compacted file
+        """
+        if not os.path.isdir(self.path):
+            return
+        with self.locked():
+            self.merge_parts()
+
+    def merge_parts(self):
+        """
+        compact() with the lock held
+        """
+        parts = self.parts()
+        if not parts:
+            return
+        compacted = os.path.join(self.path, COMPACTED)
+        tables = [self.load(compacted)] if os.path.exists(compacted) else []
+        self.write(COMPACTED, concatenate(tables + [self.load(part) for part in parts]))
+        for part in parts:
+            os.remove(part)
+
+    def read(self):
+        """
+        Return all rows as a dict of column arrays, after compacting the store
+        """
+        if not os.path.isdir(self.path):
+            return {}
+        # Under the same lock as the compaction, so that no other compaction removes parts while they are read
+        with self.locked():
+            self.merge_parts()
+            compacted = os.path.join(self.path, COMPACTED)
+            # Parts appended after the compaction above are included as well
+            return concatenate(([self.load(compacted)] if os.path.exists(compacted) else [])
+                               + [self.load(part) for part in self.parts()])
@@ -1,29 +1,61 @@
 import functools
 import math
-import random
-import uuid
 import time
 
+import numpy as np
+
 from core.config import Config
 from core.types import PacketType
-import copy
+from types import MappingProxyType
+from core.packet_queue import PacketQueue
+from core.prophet import ProphetTable
 from core.compute import point_bounce, compute_packet_generation_times, nodes_in_range
+from core.random_streams import NodeStreams
+from core.metrics import Metrics
+from core.clock import Clock
+from core.profiling import unwrapped
+from core.packet_trace import (CREATED, TRANSMITTED, DELIVERED, DUPLICATE, DROP_HOP_LIMIT, DROP_TIME_LIMIT,
+                               DROP_TX_LIMIT, DROP_QUEUE_LIMIT)
 from typing import Optional
 from graphics.text_formatting import Color
 
 class Packet:
-    def __init__(self, p_type, src, dst, c_time, hop_count, tx_time,  tx_mode, payload=None):
+    """
+    Packets are shared between nodes and must not be modified once sent. Every hop
+    works on its own small copy made by forward(), which carries the per-hop state
+    (hop_count, aether_time) and shares id and payload with the original.
+    """
+    __slots__ = ('p_type', 'src', 'dst', 'c_time', 'hop_count', 'payload', 'tx_time', 'tx_mode', 'id', 'aether_time')
+
+    def __init__(self, p_type, src, dst, c_time, hop_count, tx_time,  tx_mode, payload=None, id=None):
         self.p_type = p_type
         self.src = src
         self.dst = dst
         self.c_time = c_time
         self.hop_count = hop_count
-        self.payload = payload
+        self.payload = MappingProxyType(payload) if isinstance(payload, dict) else payload  # Read-only view
         self.tx_time = tx_time
         self.tx_mode = tx_mode
-        self.id = uuid.uuid4()
+        self.id = id  # Data packets are numbered in creation order, see Node.queue_new_data_packet()
         self.aether_time = None
 
+    def forward(self):
+        """
+        Return the copy of this packet as seen by the next hop
+        """
+        packet = Packet.__new__(Packet)
+        packet.p_type = self.p_type
+        packet.src = self.src
+        packet.dst = self.dst
+        packet.c_time = self.c_time
+        packet.hop_count = self.hop_count + 1
+        packet.payload = self.payload
+        packet.tx_time = self.tx_time
+        packet.tx_mode = self.tx_mode
+        packet.id = self.id
+        packet.aether_time = None
+        return packet
+
     def __str__(self):
         return f"{self.p_type} from {self.src} to {self.dst} at hop {self.hop_count}"
 
@@ -46,13 +78,14 @@ class Coordinate:
         return f"C: ({self.x}, {self.y})"
 
 
-    def move(self, vector, duration=Config.simulation_interval, bounce=False):
+    def move(self, vector, duration=None, bounce=False, config=Config):
+        if duration is None: duration = config.simulation_interval
         duration = duration / 1_000  # ms to s
-        self.x = round(self.x + vector.velocity * duration * math.cos(vector.heading), Config.granularity)  # Determine new x
-        self.y = round(self.y + vector.velocity * duration * math.sin(vector.heading), Config.granularity)  # Determine new y
+        self.x = round(self.x + vector.velocity * duration * math.cos(vector.heading), config.granularity)  # Determine new x
+        self.y = round(self.y + vector.velocity * duration * math.sin(vector.heading), config.granularity)  # Determine new y
 
         if bounce:
-            c = point_bounce(Coordinate(self.x, self.y))
+            c = point_bounce(Coordinate(self.x, self.y), config)
             self.x = c.x
             self.y = c.y
         return self
@@ -68,6 +101,12 @@ class Vector:
 
 
 class MobilityPayload:
+    """
+    Snapshot of a node's mobility, shared by every node that learns about it. Never
+    modify a MobilityPayload, create a new one instead.
+    """
+    __slots__ = ('coordinate', 'vector', 'timestamp')
+
     def __init__(self, coordinate, vector, timestamp):
         self.coordinate = coordinate
         self.vector = vector
@@ -96,33 +135,34 @@ class RadioTask:
 
 
 class Node:
-    sim_time = 0
-    count_sent = 0
-    count_success = 0
-    count_failure_hop_limit_exceeded = 0
-    count_failure_tx_limit_exceeded = 0
-    count_failure_queue_limit_exceeded = 0
-    count_failure_time_limit_exceeded = 0
-    count_duplicate_received = 0
-    def __init__(self, id: str, coordinate, velocity, waypoints=None):
+    def __init__(self, id: str, coordinate, velocity, waypoints=None, config=None, streams=None, metrics=None,
+                 clock=None):
         # print(random.randint(0, 100))
         if waypoints is None:
             waypoints = []
+        self.config = Config() if config is None else config
+        self.streams = NodeStreams(None, 0) if streams is None else streams  # Random generators of this node
 
         self.waypointer = 0
         # self.vector = Vector(velocity, 0)
         if len(waypoints) > 0:
-            self.vector = Vector(velocity, math.atan2(waypoints[self.waypointer].y - coordinate.y, waypoints[self.waypointer].x - coordinate.x))
+            target = Coordinate(*waypoints[self.waypointer]) if isinstance(waypoints, np.ndarray) else waypoints[self.waypointer]
+            self.vector = Vector(velocity, math.atan2(target.y - coordinate.y, target.x - coordinate.x))
 
         self.coordinate = coordinate
         self.waypoints = waypoints
-        self.queue = []
+        self.queue = PacketQueue()  # Strategy key set by bind_strategy()
         self.id = id
+        self.index = None  # Position in the engine's node list, assigned by the engine
 
         # Radio
-        self.prophet_old_nodes_in_range = set()
-        self.nodes_in_range = set()
+        self.prophet_old_nodes_in_range = []
+        self.nodes_in_range = []  # Ordered by node index, maintained by the engine from link events
         self.node_estimations = {}  # key: dst_id, value: velocity_payload
+        # MBF delta updates: node_estimations is kept ordered by estimation_versions
+        self.estimation_version = 0
+        self.estimation_versions = {}  # key: dst_id, value: estimation_version of last change
+        self.sent_versions = {}  # key: neighbor id, value: estimation_version last sent to that neighbor
         self.radioTask: Optional[RadioTask] = None
 
         # Display properties
@@ -133,18 +173,51 @@ class Node:
         self.finished = False
 
         # Traffic generation
-        self.gen_timestamps = compute_packet_generation_times(Config.mean_packet_production_interval)
+        self.gen_timestamps = compute_packet_generation_times(self.config.mean_packet_production_interval, self.config,
+                                                              self.streams.traffic)
 
-        self.received_packets = []
-        self.sent_packet_ids = []
+        self.received_ids = set()  # Ids of the packets delivered to this node
 
         self.all_node_ids = []  # WARNING: Do not touch except for target selection!
+        self.trace = None  # Optional PacketTrace, shared by all nodes of a run
+        # Shared by all nodes of a run, a node created outside an engine gets its own
+        self.metrics = Metrics(self.config) if metrics is None else metrics
+        # Shared by all nodes of a run, a node created outside an engine gets its own
+        self.clock = Clock() if clock is None else clock
+
+        self.bind_strategy()
+
+    @property
+    def sim_time(self):
+        return self.clock.time
+
+    def bind_strategy(self):
+        """
+        Strategy dispatch, bound once here instead of comparing strategy names on
+        every call. Call again after changing the strategy of self.config, while the
+        queue is empty
+        """
+        if self.config.strategy not in ('mbf', 'prophet', 'random'):
+            raise ValueError(f'Unknown strategy {self.config.strategy}')
+        self.select_relay = getattr(self, f'select_relay_{self.config.strategy}')
+        if self.config.strategy == 'mbf' and self.config.mbf_delta_updates:
+            self.update_traffic_table = self.update_traffic_table_mbf_delta
+        else:
+            self.update_traffic_table = getattr(self, f'update_traffic_table_{self.config.strategy}')
+        # Only PRoPHET orders the queue beyond the priority field
+        self.queue.key = self.queue_priority if self.config.strategy == 'prophet' else None
+
+    def __getstate__(self):
+        # Checkpoints store nodes without the run's trace and without profiling wrappers
+        state = unwrapped(self.__dict__)
+        state['trace'] = None
+        return state
 
     def update_core(self):
         """
         Used to check for things that need to be done when time steps pass
         """
-        if Config.strategy == 'prophet' and self.sim_time % 1000 == 0:
+        if self.config.strategy == 'prophet' and self.sim_time % 1000 == 0:
             # Age probabilities
             self.prophet_age()
 
@@ -171,6 +244,9 @@ class Node:
                 # Check if relay in range
                 if self.radioTask.remaining_tx <= 0:
                     # Check if transmission is complete, if so -> relay receives transmission
+                    if self.trace is not None:
+                        self.trace.record(self.sim_time, TRANSMITTED, self.radioTask.queue_item.packet.id, self.index,
+                                          self.radioTask.relay.index, self.radioTask.queue_item.packet.hop_count + 1)
                     self.radioTask.relay.receive(self.radioTask.queue_item.packet)
                     if self.radioTask.relay.id != self.radioTask.queue_item.packet.dst:
                         # If relay was not packet's destination, insert item back into queue
@@ -193,11 +269,11 @@ class Node:
                 #             self.queue_insert(rt_copy,  0)
                 #             break
                 else:
-                    self.radioTask.remaining_tx -= Config.simulation_interval
+                    self.radioTask.remaining_tx -= self.config.simulation_interval
             else:
                 # Relay no longer in range OR relay is already self, find new relay
                 self.radioTask.remaining_tx = self.radioTask.queue_item.packet.tx_time
-                self.radioTask.relay = self.select_relay(self.radioTask.queue_item.packet.dst, strategy=Config.strategy)
+                self.radioTask.relay = self.select_relay(self.radioTask.queue_item.packet.dst)
 
                 if self.radioTask.relay is not None and self.radioTask.relay not in self.nodes_in_range:
                     raise Exception(f'Selected relay {self.radioTask.relay} not in range, impossible')
@@ -205,16 +281,19 @@ class Node:
                 if self.radioTask.relay is None and len(self.queue) > 1:
                     # No relay found, if other packets are waiting, increase failure
                     self.radioTask.queue_item.failure_count += 1
-                    if self.radioTask.queue_item.failure_count > Config.max_tx_failure:
+                    if self.radioTask.queue_item.failure_count > self.config.max_tx_failure:
                         # Tx failed too many times for packet, drop
-                        self.count_failure_tx_limit_exceeded += 1
-                        print(f'Dropping radioTask {self.radioTask} due to too many tx failures!')
+                        self.metrics.failure_tx_limit += 1
+                        if self.trace is not None:
+                            self.trace.record(self.sim_time, DROP_TX_LIMIT, self.radioTask.queue_item.packet.id,
+                                              self.index)
                         self.radioTask = None
                         return
-                    self.queue_insert(self.radioTask.queue_item)
+                    # To the back, so that the other packets get their turn before this one again
+                    self.queue_insert(self.radioTask.queue_item, back=True)
                     if len(self.queue):
                         # Set next queue item as radio task
-                        queue_item = self.queue.pop(0)
+                        queue_item = self.queue.pop()
                         self.radioTask = RadioTask(queue_item, relay=self.select_relay(queue_item.packet.dst))
 
     def check_and_set_radio_task(self, queue_item=None):
@@ -222,33 +301,27 @@ class Node:
         Warning: only functions if self.radioTask is None
         """
         if self.radioTask is None:
+            if queue_item is None:
+                # Take the queue item with the highest priority, if any
+                queue_item = self.queue.peek()
             if queue_item is not None:
-                relay = self.select_relay(queue_item.packet.dst, Config.strategy)
+                relay = self.select_relay(queue_item.packet.dst)
                 self.radioTask = RadioTask(queue_item, relay)
                 self.queue.remove(queue_item)
-
-            for queue_item in self.queue:
-                relay = self.select_relay(queue_item.packet.dst, Config.strategy)
-                if relay == self:
-                    # If relay is this node, we have no proper relay candidate -> do nothing
-                    continue
-                else:
-                    # Otherwise, we have a new radioTask
-                    self.radioTask = RadioTask(queue_item, relay=relay)
-                    self.queue.remove(queue_item)
-                    break
         else:
             raise Exception('RadioTask was not none, but tried to be set')
 
     def process_time_limits(self):
         # Remove too old packets from queue
-        if self.radioTask and self.sim_time - self.radioTask.queue_item.packet.c_time > Config.max_packet_age:
+        if self.radioTask and self.sim_time - self.radioTask.queue_item.packet.c_time > self.config.max_packet_age:
+            if self.trace is not None:
+                self.trace.record(self.sim_time, DROP_TIME_LIMIT, self.radioTask.queue_item.packet.id, self.index)
             self.radioTask = None
-            self.count_failure_time_limit_exceeded += 1
-        for queue_item in self.queue:
-            if self.sim_time - queue_item.packet.c_time > Config.max_packet_age:
-                self.queue.remove(queue_item)
-                self.count_failure_time_limit_exceeded += 1
+            self.metrics.failure_time_limit += 1
+        for queue_item in self.queue.expire(self.sim_time - self.config.max_packet_age):
+            if self.trace is not None:
+                self.trace.record(self.sim_time, DROP_TIME_LIMIT, queue_item.packet.id, self.index)
+            self.metrics.failure_time_limit += 1
 
     def update_pos(self):
         if math.dist([self.coordinate.x, self.coordinate.y], [self.waypoints[self.waypointer].x, self.waypoints[self.waypointer].y]) \
@@ -258,9 +331,9 @@ class Node:
                 return
             self.waypointer += 1
 
-            new_velocity = min(max(Config.min_node_velocity, self.vector.velocity
-                               + random.uniform(-0.5 * Config.node_velocity_dd
-                                                , 0.5 * Config.node_velocity_dd)), Config.max_node_velocity)
+            new_velocity = min(max(self.config.min_node_velocity, self.vector.velocity
+                               + self.streams.mobility.uniform(-0.5 * self.config.node_velocity_dd
+                                                               , 0.5 * self.config.node_velocity_dd)), self.config.max_node_velocity)
 
             self.update_vector(new_velocity)  # Update velocity here
 
@@ -268,34 +341,78 @@ class Node:
                 <= self.vector.velocity:
             self.coordinate = self.coordinate.move(
                 Vector(math.dist([self.coordinate.x, self.coordinate.y], [self.waypoints[self.waypointer].x, self.waypoints[self.waypointer].y]),
-                       self.vector.heading))
+                       self.vector.heading), config=self.config)
             return
 
-        self.coordinate = self.coordinate.move(self.vector)
+        self.coordinate = self.coordinate.move(self.vector, config=self.config)
 
     def update_vector(self, velocity):
         self.vector = Vector(velocity, math.atan2(self.waypoints[self.waypointer].y - self.coordinate.y, self.waypoints[self.waypointer].x - self.coordinate.x))
 
-    def update_traffic_table(self, src_id, traffic_data, c_time, strategy=Config.strategy):
-        if strategy == 'mbf':
-            for node_id in [node_id for node_id in traffic_data.keys() if node_id != self.id]:
-                self.node_estimations[node_id] = traffic_data[node_id]
-        if strategy == 'prophet':
-
-            if src_id not in [n.id for n in self.prophet_old_nodes_in_range] and src_id in [n.id for n in self.nodes_in_range]:
-                start_p_src = self.node_estimations[src_id]
-                # NEW ENCOUNTER
-                # Update probability to encountered node according to PRoPHET algorithm
-                self.node_estimations[src_id] = self.node_estimations[src_id] + (1 - self.node_estimations[src_id]) * Config.prophet_p_init
-                # print(f'Src_diff: {self.node_estimations[src_id] - start_p_src}')
-
-                for node_id in [node_id for node_id in traffic_data.keys() if node_id != self.id]:
-                    start_p_n = self.node_estimations[node_id]
-                    # Update all other nodes according to PRoPHET algorithm
-                    self.node_estimations[node_id] \
-                        = self.node_estimations[node_id] + (1 - self.node_estimations[node_id]) \
-                          * self.node_estimations[src_id] * traffic_data[node_id] * Config.prophet_beta
-                    # print(f'N_diff: {self.node_estimations[node_id] - start_p_n}')
+    def update_traffic_table_mbf(self, src_id, traffic_data, c_time):
+        for node_id in [node_id for node_id in traffic_data.keys() if node_id != self.id]:
+            self.node_estimations[node_id] = traffic_data[node_id]
+
+    def update_traffic_table_mbf_delta(self, src_id, traffic_data, c_time):
+        for node_id, mobility_payload in traffic_data.items():
+            if node_id != self.id:
+                self.merge_estimation(node_id, mobility_payload)
+
+    def update_traffic_table_prophet(self, src_id, traffic_data, c_time):
+        if not any(n.id == src_id for n in self.prophet_old_nodes_in_range) \
+                and any(n.id == src_id for n in self.nodes_in_range):
+            # NEW ENCOUNTER
+            # Update probabilities to the encountered node and, transitively, all other nodes (PRoPHET)
+            self.node_estimations.encounter(src_id, traffic_data, self.id,
+                                            self.config.prophet_p_init, self.config.prophet_beta)
+
+    def update_traffic_table_random(self, src_id, traffic_data, c_time):
+        pass
+
+    def merge_estimation(self, node_id, mobility_payload: MobilityPayload):
+        """
+        Keep the newest of the known and the received estimation of a node. Changed
+        entries move to the end of node_estimations, so it stays ordered by version
+        """
+        known = self.node_estimations.get(node_id)
+        if known is not None:
+            if known.timestamp >= mobility_payload.timestamp:
+                return
+            del self.node_estimations[node_id]
+        self.estimation_version += 1
+        self.node_estimations[node_id] = mobility_payload
+        self.estimation_versions[node_id] = self.estimation_version
+
+    def estimations_since(self, version):
+        """
+        Return all estimations that changed after the given version, newest first
+        """
+        changed = {}
+        for node_id in reversed(self.node_estimations):
+            if self.estimation_versions[node_id] <= version:
+                break
+            changed[node_id] = self.node_estimations[node_id]
+        return changed
+
+    def delta_broadcast_zero_time(self, own_payload: MobilityPayload, c_time):
+        """
+        MBF delta update: send every node in range only the estimations that changed
+        since the last update it got from this node, plus this node's own mobility
+        """
+        for node in self.nodes_in_range:
+            payload = self.estimations_since(self.sent_versions.get(node.id, 0))
+            payload[self.id] = own_payload
+            node.receive(Packet(
+                p_type=PacketType.TRAFFIC_UPDATE,
+                src=self.id,
+                dst=None,
+                c_time=c_time,
+                hop_count=0,
+                tx_time=0,
+                tx_mode='broadcast',
+                payload=payload
+            ))
+            self.sent_versions[node.id] = self.estimation_version
 
     def broadcast_zero_time(self, packet):
         """
@@ -309,15 +426,17 @@ class Node:
             node.receive(packet)
 
     def receive(self, packet):
-        packet_ = copy.deepcopy(packet)  # Make deepcopy before continuing
-        packet_.hop_count += 1
-        if packet_.hop_count > Config.max_hops:
-            self.count_failure_hop_limit_exceeded += 1
-            print(f'Dropping packet {packet_} due to exceeding hop count!')
+        packet_ = packet.forward()  # Per-hop copy, the payload is shared
+        if packet_.hop_count > self.config.max_hops:
+            self.metrics.failure_hop_limit += 1
+            if self.trace is not None and packet_.p_type == PacketType.DATA:
+                self.trace.record(self.sim_time, DROP_HOP_LIMIT, packet_.id, self.index, -1, packet_.hop_count)
             return
 
-        if self.sim_time - packet_.c_time > Config.max_packet_age:
-            self.count_failure_time_limit_exceeded += 1
+        if self.sim_time - packet_.c_time > self.config.max_packet_age:
+            self.metrics.failure_time_limit += 1
+            if self.trace is not None and packet_.p_type == PacketType.DATA:
+                self.trace.record(self.sim_time, DROP_TIME_LIMIT, packet_.id, self.index, -1, packet_.hop_count)
             # 3rd does not have this code in it. Other two are random/mbf with this.
             return
 
@@ -326,21 +445,23 @@ class Node:
         elif packet_.p_type == PacketType.DATA:
             if packet_.dst == self.id:
                 packet_.aether_time = self.sim_time - packet_.c_time
-                print(f'Packet {packet_.id} received at destination succesfully in '
-                      f'{packet_.hop_count} hops and {packet_.aether_time} ms!')
                 self.process_packet(packet_)
-            elif packet.id not in [q_i.packet.id for q_i in self.queue] \
+            elif packet.id not in self.queue \
                     and (self.radioTask is None or packet.id != self.radioTask.queue_item.packet.id):
                 self.queue_insert(QueueItem(packet_, self.sim_time))
 
     def process_packet(self, packet):
-        if packet.id not in [p.id for p in self.received_packets]:
+        if packet.id not in self.received_ids:
             # Check if this packet was already received before
             # We care only interested in the first time this packet was received, ignore others
-            self.received_packets.append(packet)
-            self.count_success += 1
+            self.received_ids.add(packet.id)
+            self.metrics.packet_delivered(packet.aether_time, packet.hop_count)
+            if self.trace is not None:
+                self.trace.record(self.sim_time, DELIVERED, packet.id, self.index, -1, packet.hop_count)
         else:
-            self.count_duplicate_received += 1
+            self.metrics.duplicates += 1
+            if self.trace is not None:
+                self.trace.record(self.sim_time, DUPLICATE, packet.id, self.index, -1, packet.hop_count)
 
     def estimate_current_coordinate(self, target_id):
         """
@@ -349,9 +470,10 @@ class Node:
         """
         if target_id not in self.node_estimations:
             return None
-        dst_mobility_payload: MobilityPayload = copy.deepcopy(self.node_estimations[target_id])
+        dst_mobility_payload: MobilityPayload = self.node_estimations[target_id]
         age = self.sim_time - dst_mobility_payload.timestamp
-        return dst_mobility_payload.coordinate.move(dst_mobility_payload.vector, duration=age, bounce=True)
+        coordinate = Coordinate(dst_mobility_payload.coordinate.x, dst_mobility_payload.coordinate.y)
+        return coordinate.move(dst_mobility_payload.vector, duration=age, bounce=True, config=self.config)
 
     def vector_key(self, dst_coordinate_estimate, mobility_payload: MobilityPayload):
         # dst_coordinate_estimate: estimate of the location of the destination
@@ -361,61 +483,63 @@ class Node:
 
         # # Calculate the age of the mobility vector, then add the uncertainty (factor * 2pi) to the calculated angle
         # mobility_age = self.sim_time - mobility_payload.timestamp
-        # relay_uncertainty_factor = math.pi * mobility_age / Config.max_vector_age
+        # relay_uncertainty_factor = math.pi * mobility_age / self.config.max_vector_age
 
         delta = abs(angle - mobility_payload.vector.heading)
         if delta > math.pi:
             delta = 2 * math.pi - delta
 
-        return delta # * (1 - (mobility_payload.timestamp / Config.max_age_traffic_data))
+        return delta # * (1 - (mobility_payload.timestamp / self.config.max_age_traffic_data))
 
-    def select_relay(self, target_id, strategy=Config.strategy):  # Forwarding algo input here
+    def select_relay_mbf(self, target_id):  # Forwarding algo input here
         """
-        strategy='mbf' -> The relay is selected based on the estimated location of the destination.
+        The relay is selected based on the estimated location of the destination.
         We do not have to take into account the inaccuracy here, because the node
         with the best vector towards the estimated point is the best effort option
         regardless of how accurate our guess was
         """
-        if strategy == 'mbf':
-            dst_estimation = self.estimate_current_coordinate(target_id)
-            if dst_estimation is None:
-                return None
-            partial_vector_key = functools.partial(self.vector_key, dst_estimation)
-            relays = sorted(self.nodes_in_range, key=lambda node: partial_vector_key(
-                MobilityPayload(
-                    coordinate=node.coordinate,
-                    vector=node.vector,
-                    timestamp=node.sim_time
-                )))
-            if len(relays) == 0:
-                return None
-
-            relay = relays[0]
-            self_angle = self.vector_key(dst_estimation, MobilityPayload(self.coordinate, self.vector, self.sim_time))
-            relay_angle = self.vector_key(dst_estimation, MobilityPayload(relay.coordinate, relay.vector, self.sim_time))
-
-            delta = abs(self_angle - relay_angle)
-            if delta > math.pi:
-                delta = 2 * math.pi - delta
-            if self_angle < relay_angle or delta < Config.min_relay_improvement: # Second one has this code
-                # Do not forward, keep packet ourselves
-                return None
-            return relay
-        elif strategy == 'prophet':
-            relays = sorted(self.nodes_in_range, key=lambda node: self.node_estimations[node.id], reverse=True)
-            if len(relays) == 0 or self.node_estimations[relays[0].id] < self.node_estimations[self.id]:
-                return None
-            return relays[0]
-        elif strategy == 'random':
-            if random.randint(0, 1) == 0 or len(self.nodes_in_range) == 0:
-                return None
-            else:
-                choice = random.randint(0, len(self.nodes_in_range) - 1)
-                return list(self.nodes_in_range)[choice]
+        dst_estimation = self.estimate_current_coordinate(target_id)
+        if dst_estimation is None:
+            return None
+        partial_vector_key = functools.partial(self.vector_key, dst_estimation)
+        relays = sorted(self.nodes_in_range, key=lambda node: partial_vector_key(
+            MobilityPayload(
+                coordinate=node.coordinate,
+                vector=node.vector,
+                timestamp=node.sim_time
+            )))
+        if len(relays) == 0:
+            return None
+
+        relay = relays[0]
+        self_angle = self.vector_key(dst_estimation, MobilityPayload(self.coordinate, self.vector, self.sim_time))
+        relay_angle = self.vector_key(dst_estimation, MobilityPayload(relay.coordinate, relay.vector, self.sim_time))
+
+        delta = abs(self_angle - relay_angle)
+        if delta > math.pi:
+            delta = 2 * math.pi - delta
+        if self_angle < relay_angle or delta < self.config.min_relay_improvement: # Second one has this code
+            # Do not forward, keep packet ourselves
+            return None
+        return relay
+
+    def select_relay_prophet(self, target_id):
+        relays = sorted(self.nodes_in_range, key=lambda node: self.node_estimations[node.id], reverse=True)
+        if len(relays) == 0 or self.node_estimations[relays[0].id] < self.node_estimations[self.id]:
+            return None
+        return relays[0]
+
+    def select_relay_random(self, target_id):
+        if self.streams.relay.integers(2) == 0 or len(self.nodes_in_range) == 0:
+            return None
+        else:
+            choice = int(self.streams.relay.integers(len(self.nodes_in_range)))
+            return list(self.nodes_in_range)[choice]
 
     def queue_new_data_packet(self, payload=None, tx_mode='unicast', prio=0):
 
-        destination_id = random.choice(self.all_node_ids)
+        destination = self.streams.traffic.integers(len(self.all_node_ids))  # all_node_ids is in node index order
+        destination_id = self.all_node_ids[destination]
         packet = Packet(
             p_type=PacketType.DATA,
             src=self.id,
@@ -424,16 +548,19 @@ class Node:
             hop_count=0,
             payload=payload,
             tx_time=100,
-            tx_mode=tx_mode
+            tx_mode=tx_mode,
+            id=self.metrics.sent  # Number of data packets created in this run so far
         )
-        # relay = self.select_relay(destination_id, strategy=Config.strategy)
+        if self.trace is not None:
+            self.trace.record(self.sim_time, CREATED, packet.id, self.index, int(destination))
+        # relay = self.select_relay(destination_id)
         queue_item = QueueItem(packet, self.sim_time, prio=prio)
         if self.radioTask is None:
             # Set queue item as radioTask if there was none
             self.radioTask = RadioTask(queue_item, relay=self.select_relay(packet.dst))
         elif prio - self.radioTask.queue_item.prio > 10:
             # If priority of new packet is significantly higher, immediately replace current radioTask
-            self.queue_insert(0, self.radioTask.queue_item)
+            self.queue_insert(self.radioTask.queue_item)
             self.radioTask = RadioTask(queue_item, relay=self.select_relay(packet.dst))
         else:
             # Otherwise, append to queue as usual
@@ -441,50 +568,54 @@ class Node:
             # Order queue by priority
             # self.queue = sorted(self.queue, key=lambda q_i: q_i.prio, reverse=True) # ToDo sort by relay
         #print('new packet generated!')
-        self.sent_packet_ids.append(packet.id)
-        self.count_sent += 1
-
-    def queue_insert(self, queue_item, index=None):
-        old_len = len(self.queue)
-        if len(self.queue) == Config.max_queue_length:
-            # print(f'Exceeding queue length of {Config.max_queue_length} evicting with {Color.UNDERLINE}SHLI{Color.END}')
-            self.count_failure_queue_limit_exceeded += 1
-            shli_select = sorted([q_i for q_i in self.queue], key=lambda q_i: q_i.packet.c_time)[0]
+        self.metrics.sent += 1
+
+    def queue_insert(self, queue_item, back=False):
+        if len(self.queue) >= self.config.max_queue_length:
+            # print(f'Exceeding queue length of {self.config.max_queue_length} evicting with {Color.UNDERLINE}SHLI{Color.END}')
+            self.metrics.failure_queue_limit += 1
+            shli_select = self.queue.oldest()
             if shli_select.packet.c_time < queue_item.packet.c_time:
                 # New queue item is younger than one or more other queue items -> evict oldest one
                 self.queue.remove(shli_select)
+                if self.trace is not None:
+                    self.trace.record(self.sim_time, DROP_QUEUE_LIMIT, shli_select.packet.id, self.index)
             else:
                 # Otherwise, new queue item is older than all current queue items
+                if self.trace is not None:
+                    self.trace.record(self.sim_time, DROP_QUEUE_LIMIT, queue_item.packet.id, self.index)
                 return
-        if index is None:
-            self.queue.append(queue_item)
-        else:
-            self.queue.insert(index, queue_item)
-        if len(self.queue) - old_len > 1:
-            raise Exception('More than one queue item added, ERROR')
+        self.queue.push(queue_item, back)
+
+    def queue_priority(self, queue_item):
+        """
+        PRoPHET queue order, lower values are transmitted first: packets to destinations
+        with the highest predictability first, ranked independent of aging
+        """
+        return -self.node_estimations.rank(queue_item.packet.dst)
 
     def order_queue(self):
-        if Config.strategy == 'random':
+        if self.config.strategy == 'random':
             return
-        if Config.strategy == 'mbf':
+        if self.config.strategy == 'mbf':
             # self.queue = sorted(self.queue, key=lambda queue_item: self.vector_key(self.estimate_current_coordinate(queue_item.packet.dst), ))
             return
-        if Config.strategy == 'prophet':
-            self.queue = sorted(self.queue, key=lambda queue_item: self.node_estimations[queue_item.packet.dst], reverse=True)
-
+        if self.config.strategy == 'prophet':
+            # Only items to destinations whose predictabilities changed since the last call
+            self.queue.reprioritize(self.node_estimations.take_changed(self.queue.destinations))
 
     def get_node_in_range_by_id(self, node_id):
         for node in self.nodes_in_range:
             if node.id == node_id:
                 return node
 
-    def prophet_init(self):
-        for n_id in self.all_node_ids:
-            self.node_estimations[n_id] = 0
+    def prophet_init(self, node_indices):
+        # All probabilities start at 0
+        self.node_estimations = ProphetTable(node_indices, self.config.prophet_gamma)
 
     def prophet_age(self):
-        for node_id in self.node_estimations.keys():
-            self.node_estimations[node_id] = self.node_estimations[node_id] * Config.prophet_gamma
+        # Entries are aged when they are read, see ProphetTable
+        self.node_estimations.age()
 
 
     def __str__(self):
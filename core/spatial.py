@@ -0,0 +1,100 @@
+import numpy as np
+
+"""
+Spatial index
+
+Uniform cell grid used for neighbor discovery. With the cell size equal to the
+radio range, every node within range of a node lies in the 3x3 block of cells
+around that node's cell, so a neighbor query only has to check those cells
+instead of every node in the simulation.
+"""
+
+# Cell offsets that, together with the cell itself, visit every pair of adjacent cells exactly once
+HALF_STENCIL = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialGrid:
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError('Cell size must be larger than 0')
+        self.cell_size = cell_size
+        self.cells = {}  # key: (cell_x, cell_y), value: set of nodes
+        self.node_cells = {}  # key: node, value: (cell_x, cell_y)
+
+    def cell_of(self, coordinate):
+        return int(coordinate.x // self.cell_size), int(coordinate.y // self.cell_size)
+
+    def insert(self, node):
+        cell = self.cell_of(node.coordinate)
+        self.cells.setdefault(cell, set()).add(node)
+        self.node_cells[node] = cell
+
+    def remove(self, node):
+        cell = self.node_cells.pop(node)
+        self.cells[cell].discard(node)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def update(self, node):
+        """
+        Move node to the cell of its current coordinate, call this after the node moved
+        """
+        cell = self.cell_of(node.coordinate)
+        if self.node_cells[node] != cell:
+            self.remove(node)
+            self.cells.setdefault(cell, set()).add(node)
+            self.node_cells[node] = cell
+
+    def candidate_pairs(self):
+        """
+        Return index arrays (i, j) with i < j of all node pairs in the same or in
+        adjacent cells. Every pair is produced exactly once.
+        """
+        members = {cell: np.fromiter((node.index for node in nodes), dtype=np.int64, count=len(nodes))
+                   for cell, nodes in self.cells.items()}
+        firsts, seconds = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for (cell_x, cell_y), a in members.items():
+            # Pairs inside the cell
+            i, j = np.triu_indices(len(a), 1)
+            firsts.append(a[i])
+            seconds.append(a[j])
+            # Pairs with the forward half of the surrounding cells
+            for dx, dy in HALF_STENCIL:
+                b = members.get((cell_x + dx, cell_y + dy))
+                if b is not None:
+                    firsts.append(np.repeat(a, len(b)))
+                    seconds.append(np.tile(b, len(a)))
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        return np.minimum(first, second), np.maximum(first, second)
+
+
+def cell_pairs(cell_x, cell_y):
+    """
+    Return index arrays (i, j) with i < j of all pairs of nodes in the same or in
+    adjacent cells, given the grid cell of every node. Produces the same pairs as
+    SpatialGrid.candidate_pairs() with array operations only, for callers that keep
+    cells in arrays (see NodeStore.changed_cells()).
+    """
+    if not len(cell_x):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # One key per cell, with a free row above and below every column so neighbors do not wrap
+    height = int(cell_y.max() - cell_y.min()) + 3
+    cell_keys = cell_x.astype(np.int64) * height + (cell_y - cell_y.min() + 1)
+    order = np.argsort(cell_keys, kind='stable')
+    keys = cell_keys[order]
+    positions = np.arange(len(keys))
+
+    # Pairs inside a cell, then pairs with the forward half of the surrounding cells
+    ranges = [(positions + 1, np.searchsorted(keys, keys, 'right'))]
+    for dx, dy in HALF_STENCIL:
+        neighbor_keys = keys + dx * height + dy
+        ranges.append((np.searchsorted(keys, neighbor_keys, 'left'), np.searchsorted(keys, neighbor_keys, 'right')))
+
+    firsts, seconds = [], []
+    for begin, end in ranges:
+        counts = end - begin
+        offsets = np.cumsum(counts) - counts  # Position of the first pair of every node
+        firsts.append(np.repeat(positions, counts))
+        seconds.append(np.repeat(begin - offsets, counts) + np.arange(counts.sum()))
+    first, second = order[np.concatenate(firsts)], order[np.concatenate(seconds)]
+    return np.minimum(first, second), np.maximum(first, second)
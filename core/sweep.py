@@ -0,0 +1,99 @@
+import contextlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.config import Config
+from core.engine import Engine
+from core.event_engine import EventEngine
+from core.results_store import ResultsStore
+from core.warm_start import WarmStart
+from graphics.text_formatting import Color
+
+"""
+Parameter sweeps
+
+Runs a grid of Config overrides times a list of seeds on a process pool. Every
+run gets its own Config instance, worker processes are reused between runs, and
+rows are appended to a results store in run order, as soon as a run and all runs
+before it have finished. Warm-started sweeps run one
+burn-in per seed and fork the grid points from it, see core.warm_start.
+"""
+
+
+def expand_grid(grid):
+    """
+    Turn {field: [values]} into a list of {field: value} dicts, one per grid point
+    """
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_simulation(seed, overrides):
+    """
+    Run one simulation headless and return its result row. Runs in a worker process.
+    """
+    config = Config(**overrides)
+
+    started = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        engine_class = EventEngine if config.engine == 'event' else Engine
+        engine = engine_class(seed, config, result_files=False)
+        engine.run()
+        if isinstance(engine, EventEngine):
+            engine.advance_to(max(engine.sim_time, config.max_sim_time))
+        summary = engine.summary()
+        engine.finish()
+    return {**engine.result_row(summary), 'wall_time': round(time.time() - started, 3)}
+
+
+def run_sweep(grid, seeds, result_path, workers=None, base=None):
+    """
+    Run every grid point for every seed on a process pool (all cores by default),
+    and append one row per run to the results store at result_path, in the order of
+    the grid points and seeds. base holds Config overrides shared by all runs
+    """
+    for name in grid:
+        if name not in Config.fields():
+            raise AttributeError(f'Config has no field {name}')
+    runs = [(seed, {**(base or {}), **overrides}) for overrides in expand_grid(grid) for seed in seeds]
+    store = ResultsStore(result_path)
+
+    print(f"{Color.GREEN}{Color.BOLD}Sweep of {len(runs)} runs started{Color.END}")
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(run_simulation, seed, overrides) for seed, overrides in runs]
+        for i, future in enumerate(futures):
+            row = future.result()
+            store.append(row)
+            rows.append(row)
+            print_row(i, len(runs), row, grid)
+    store.compact()
+    return rows
+
+
+def run_warm_sweep(grid, seeds, burn_in, result_path, workers=None, base=None):
+    """
+    Run a burn-in of burn_in ms once per seed and fork every grid point from it, at
+    most workers (all cores by default) at a time, and append one row per run to the
+    results store at result_path. base holds Config overrides shared by all runs
+    """
+    variants = expand_grid(grid)
+    store = ResultsStore(result_path)
+
+    print(f"{Color.GREEN}{Color.BOLD}Warm-started sweep of {len(variants) * len(seeds)} runs started{Color.END}")
+    rows = []
+    for seed in seeds:
+        for row in WarmStart(seed, Config(**(base or {})), variants, burn_in).run(workers):
+            store.append(row)
+            rows.append(row)
+            print_row(len(rows) - 1, len(variants) * len(seeds), row, grid)
+    store.compact()
+    return rows
+
+
+def print_row(i, n_runs, row, grid):
+    print(f"[{i + 1}/{n_runs}] seed {row['seed']} "
+          f"{', '.join(f'{name}={row[name]}' for name in grid)}: "
+          f"{row['success_count']}/{row['total_sent']} delivered")
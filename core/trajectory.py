@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+from core.config import Config
+
+"""
+Trajectories
+
+Mobility compiled up front into piecewise-linear trajectories. Node row r moves
+in segments: segment k starts at times[r, k] in (x[r, k], y[r, k]) and moves with
+(vx[r, k], vy[r, k]) px per ms until the next segment starts. The position of
+every node at any time t is one binary search plus one interpolation.
+
+Segments follow the tick engine's mobility model (Node.update_pos()): a node
+moves in a straight line towards its current waypoint until it is closer to it
+than its velocity, and from there heads to the next waypoint with a jittered
+velocity drawn from its mobility stream. Only the per-tick rounding of positions
+is left out. Rows are padded by repeating their last segment.
+"""
+
+
+class Trajectories:
+    def __init__(self, times, x, y, vx, vy, velocity, heading, waypointer, finished, lengths):
+        self.times = times
+        self.x = x
+        self.y = y
+        self.vx = vx  # px per ms
+        self.vy = vy
+        # Node state during each segment, as seen through Node.vector, Node.waypointer and Node.finished
+        self.velocity = velocity  # px per s
+        self.heading = heading
+        self.waypointer = waypointer
+        self.finished = finished
+        self.lengths = lengths  # Number of segments of each row
+        self.rows = np.arange(len(times))
+
+    @classmethod
+    def compile(cls, store, config=Config, until=np.inf):
+        """
+        Compile the trajectories of all nodes in store from their current state, until
+        the first segment that ends after time until
+        """
+        rows = [cls.compile_row(store, row, config, until) for row in range(store.size)]
+        length = max((len(segments) for segments in rows), default=1)
+        # Pad every row with copies of its last segment
+        table = np.array([segments + [segments[-1]] * (length - len(segments)) for segments in rows]).reshape(-1, length, 9)
+        columns = [np.ascontiguousarray(table[:, :, column]) for column in range(9)]
+        columns[7] = columns[7].astype(np.int64)  # waypointer
+        columns[8] = columns[8].astype(bool)  # finished
+        return cls(*columns, lengths=np.array([len(segments) for segments in rows], dtype=np.int64))
+
+    @staticmethod
+    def compile_row(store, row, config, until):
+        time = 0.0
+        x, y = store.x[row], store.y[row]
+        velocity, heading = store.velocity[row], store.heading[row]
+        waypointer, finished = int(store.waypointer[row]), bool(store.finished[row])
+        n_waypoints = int(store.n_waypoints[row])
+        waypoints = store.waypoints[row]
+        # Jitter of every velocity change, drawn in one go, the same values as drawing them one by one
+        jitter = iter(store.rngs[row].uniform(-0.5 * config.node_velocity_dd, 0.5 * config.node_velocity_dd,
+                                              size=max(n_waypoints - waypointer - 1, 0)).tolist())
+
+        segments = []  # (time, x, y, vx, vy, velocity, heading, waypointer, finished)
+        while True:
+            if finished or n_waypoints == 0:
+                segments.append((time, x, y, 0, 0, velocity, heading, waypointer, finished))
+                return segments
+            target_x, target_y = waypoints[waypointer]
+            distance = math.dist([x, y], [target_x, target_y])
+            travel = max(distance - velocity, 0)  # Arrived once closer than velocity, like Node.update_pos()
+            step = velocity / 1_000  # px per ms
+            segments.append((time, x, y, step * math.cos(heading), step * math.sin(heading),
+                             velocity, heading, waypointer, finished))
+            end = time + travel / step if step > 0 else np.inf
+            if end > until:
+                return segments
+
+            # Arrival at the waypoint
+            if distance > 0:
+                x, y = x + (target_x - x) * travel / distance, y + (target_y - y) * travel / distance
+            time = end
+            if waypointer >= n_waypoints - 1:
+                finished = True
+            else:
+                velocity = min(max(config.min_node_velocity, velocity + next(jitter)), config.max_node_velocity)
+                waypointer += 1
+                target_x, target_y = waypoints[waypointer]
+                heading = math.atan2(target_y - y, target_x - x)
+
+    def segment_at(self, time, rows=None):
+        """
+        Return the index of the segment every row (or the given rows) is in at time,
+        with a binary search over all rows at once
+        """
+        rows = self.rows if rows is None else rows
+        low = np.zeros(len(rows), dtype=np.int64)  # times[row, low] <= time, or low is 0
+        high = self.lengths[rows].copy()  # times[row, high] > time, or high is past the last segment
+        while True:
+            searching = high - low > 1
+            if not searching.any():
+                return low
+            middle = (low + high) // 2
+            later = searching & (self.times[rows, middle] > time)
+            high = np.where(later, middle, high)
+            low = np.where(searching & ~later, middle, low)
+
+    def positions(self, time, rows=None, segment=None):
+        """
+        Return the x and y coordinates of every row (or the given rows) at time, in
+        the given segments or in the segments they are in at time
+        """
+        rows = self.rows if rows is None else rows
+        if segment is None:
+            segment = self.segment_at(time, rows)
+        elapsed = time - self.times[rows, segment]
+        return (self.x[rows, segment] + self.vx[rows, segment] * elapsed,
+                self.y[rows, segment] + self.vy[rows, segment] * elapsed)
+
+    def segment_end(self, row, segment):
+        """
+        Return the time segment of row ends, inf if it is the last one
+        """
+        return float(self.times[row, segment + 1]) if segment + 1 < self.lengths[row] else np.inf
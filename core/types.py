@@ -4,3 +4,12 @@ from enum import Enum
 class PacketType(Enum):
     TRAFFIC_UPDATE = 1
     DATA = 2
+
+
+class EventType(Enum):
+    WAYPOINT_ARRIVAL = 1
+    LINK_UP = 2
+    LINK_DOWN = 3
+    PACKET_GENERATION = 4
+    TRANSMISSION_COMPLETE = 5
+    PROPHET_AGING = 6
@@ -0,0 +1,228 @@
+import contextlib
+import os
+import pickle
+import select
+import sys
+import time
+import traceback
+
+from core.config import Config
+from core.engine import Engine
+from core.metrics import Metrics
+from core.prophet import ProphetTable
+
+"""
+Warm start
+
+Runs a shared burn-in once and forks one child process per variant, every child
+continues from the same state. Mobility, links and random generators are shared
+by all variants, so their runs are paired: they differ only in what the variant
+changes.
+
+During the burn-in nodes move and exchange traffic updates, but do not generate
+data packets; the traffic of every node is shifted to start at the end of the
+burn-in. The routing state every variant needs (MBF estimations, PRoPHET
+predictabilities) is built during the burn-in for every distinct warm-up config,
+by swapping that state into the nodes before its traffic updates are sent.
+
+Forking copies the burn-in state copy-on-write, without pickling it, so warm
+starts need os.fork (POSIX) and the tick engine.
+"""
+
+# Config fields a variant may override, they do not change the shared mobility, links or traffic
+VARIANT_FIELDS = ('strategy', 'mbf_delta_updates', 'prophet_p_init', 'prophet_beta', 'prophet_gamma',
+                  'max_tx_failure', 'max_hops', 'max_queue_length', 'max_packet_age', 'min_relay_improvement',
+                  'max_vector_age', 'queue_remain_time', 'packet_trace', 'packet_trace_background', 'profile',
+                  'checkpoint', 'checkpoint_interval', 'metrics_delay_bin', 'metrics_snapshot_interval')
+# Config fields the routing state built during the burn-in depends on, variants that agree on them share it
+WARM_UP_FIELDS = ('strategy', 'mbf_delta_updates', 'prophet_p_init', 'prophet_beta', 'prophet_gamma')
+# Node attributes holding routing state
+STATE_ATTRIBUTES = ('node_estimations', 'estimation_version', 'estimation_versions', 'sent_versions')
+
+
+class WarmStart:
+    def __init__(self, seed, config, variants, burn_in):
+        """
+        variants is a list of {field: value} Config overrides, burn_in the simulated
+        time in ms before data traffic starts
+        """
+        if config.engine != 'tick':
+            raise ValueError('Warm starts need the tick engine')
+        if not 0 <= burn_in < config.max_sim_time:
+            raise ValueError(f'Burn-in of {burn_in} ms does not end before max_sim_time')
+        for overrides in variants:
+            for name in overrides:
+                if name not in VARIANT_FIELDS:
+                    raise ValueError(f'{name} cannot differ between the variants of one burn-in')
+
+        self.seed = seed
+        self.burn_in = burn_in
+        self.variants = variants
+        self.configs = [Config(**{**config.values(), **overrides}) for overrides in variants]
+
+        # The burn-in engine has no routing state and no per-run outputs of its own
+        self.engine = Engine(seed, Config(**{**config.values(), 'strategy': 'random', 'mbf_delta_updates': False,
+                                             'packet_trace': None, 'profile': None, 'checkpoint': None}),
+                             result_files=False)
+        self.engine.queue_hook = self.burn_in_hook
+
+        # key: values of WARM_UP_FIELDS, value: (config, routing state of every node), random has no state
+        self.warm_ups = {}
+        node_indices = {node.id: node.index for node in self.engine.nodes}
+        for variant_config in self.configs:
+            key = self.warm_up_key(variant_config)
+            if variant_config.strategy != 'random' and key not in self.warm_ups:
+                self.warm_ups[key] = (variant_config, [self.initial_state(variant_config, node_indices)
+                                                       for _ in self.engine.nodes])
+
+    @staticmethod
+    def warm_up_key(config):
+        return tuple(getattr(config, name) for name in WARM_UP_FIELDS)
+
+    @staticmethod
+    def initial_state(config, node_indices):
+        if config.strategy == 'prophet':
+            # All probabilities start at 0
+            return {'node_estimations': ProphetTable(node_indices, config.prophet_gamma), 'estimation_version': 0,
+                    'estimation_versions': {}, 'sent_versions': {}}
+        return {'node_estimations': {}, 'estimation_version': 0, 'estimation_versions': {}, 'sent_versions': {}}
+
+    def use_strategy(self, config, states):
+        """
+        Bind config and, if given, swap in the routing state of every node
+        """
+        engine = self.engine
+        engine.config = config
+        engine.bind_strategy()
+        for node, state in zip(engine.nodes, states or ()):
+            node.__dict__.update(state)
+        for node in engine.nodes:
+            node.config = config
+            node.bind_strategy()
+
+    def burn_in_hook(self):
+        """
+        Replaces the engine's queue_hook during the burn-in: links are updated once,
+        traffic updates are sent once per warm-up
+        """
+        engine = self.engine
+        if engine.contact_plan is not None:
+            links_up, links_down = engine.contact_plan.events(engine.step_count)
+        else:
+            links_up, links_down = engine.discover_links()
+        changed_nodes = engine.apply_link_events(links_up, links_down)
+
+        burn_in_config = engine.config
+        for config, states in self.warm_ups.values():
+            self.use_strategy(config, states)
+            if config.strategy == 'prophet' and engine.clock.time % 1000 == 0:
+                # Age probabilities
+                for node in engine.nodes:
+                    if not node.finished:
+                        node.prophet_age()
+            for node in changed_nodes:
+                engine.send_service_broadcast_packet(src_node=node)
+            for node, state in zip(engine.nodes, states):
+                for name in STATE_ATTRIBUTES:
+                    state[name] = getattr(node, name)
+        self.use_strategy(burn_in_config, None)
+
+    def run_burn_in(self):
+        engine = self.engine
+        while engine.sim_time < self.burn_in:
+            engine.step()
+        del engine.queue_hook
+
+    def start_variant(self, config):
+        """
+        Turn the burn-in engine into the engine of the variant with config, in the
+        forked child
+        """
+        engine = self.engine
+        warm_up = self.warm_ups.get(self.warm_up_key(config))
+        self.use_strategy(config, None if warm_up is None else warm_up[1])
+
+        start = engine.clock.time  # Node time of the first tick of the variant
+        engine.h_factor = config.h_factor
+        engine.metrics = Metrics(config)
+        if config.packet_trace is not None:
+            engine.initialize_trace()
+        if config.checkpoint is not None:
+            engine.checkpoint_path = os.path.join(config.checkpoint, f'{engine.run_name()}.ckpt')
+            engine.next_checkpoint = engine.sim_time + config.checkpoint_interval
+        for node in engine.nodes:
+            node.trace = engine.trace
+            node.metrics = engine.metrics
+            # Data traffic starts at the end of the burn-in
+            node.gen_timestamps = [timestamp + start for timestamp in node.gen_timestamps]
+        if config.profile is not None:
+            engine.initialize_profiler()
+
+    def run_variant(self, index):
+        """
+        Run variant index to the end and return its result row. Runs in a forked child
+        """
+        config = self.configs[index]
+        started = time.time()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            self.start_variant(config)
+            self.engine.run()
+            summary = self.engine.summary()
+            self.engine.finish()
+        return {**self.engine.result_row(summary), 'burn_in': self.burn_in,
+                'wall_time': round(time.time() - started, 3)}
+
+    def run(self, workers=None):
+        """
+        Run the burn-in, then every variant in a forked child, at most workers (all
+        cores by default) at a time. Returns one result row per variant, in order
+        """
+        self.run_burn_in()
+        workers = workers or os.cpu_count()
+        rows = [None] * len(self.variants)
+        running = {}  # key: child pid, value: (variant index, read end of its result pipe, chunks read so far)
+        for index in range(len(self.variants)):
+            while len(running) >= workers:
+                self.collect(running, rows)
+            read, write = os.pipe()
+            sys.stdout.flush()  # Output buffered before the fork would be written by every child
+            pid = os.fork()
+            if pid == 0:
+                os.close(read)
+                status = 1
+                try:
+                    with os.fdopen(write, 'wb') as pipe:
+                        pickle.dump(self.run_variant(index), pipe)
+                    status = 0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(status)
+            os.close(write)
+            running[pid] = (index, read, [])
+        while running:
+            self.collect(running, rows)
+        return rows
+
+    def collect(self, running, rows):
+        """
+        Read the result pipes that are ready, and store the result row of every child
+        that closed its pipe. Children are only waited for once their pipe is read to
+        the end, a child blocks on a full pipe until it is read
+        """
+        ready, _, _ = select.select([read for _, read, _ in running.values()], [], [])
+        for pid, (index, read, chunks) in list(running.items()):
+            if read not in ready:
+                continue
+            chunk = os.read(read, 1 << 16)
+            if chunk:
+                chunks.append(chunk)
+                continue
+            # End of file, the child closed its end of the pipe
+            os.close(read)
+            del running[pid]
+            _, status = os.waitpid(pid, 0)
+            data = b''.join(chunks)
+            if os.waitstatus_to_exitcode(status) != 0 or not data:
+                raise RuntimeError(f'Variant {self.variants[index]} failed')
+            rows[index] = pickle.loads(data)
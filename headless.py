@@ -0,0 +1,34 @@
+import argparse
+
+from core.config import Config
+from core.engine import Engine
+from core.event_engine import EventEngine
+
+"""
+Headless entry point
+
+Runs the simulation without Tkinter and without real-time pacing, as fast as the
+CPU allows. A run with the same seed produces the same results as main.py. A run
+resumed from a checkpoint continues exactly like the run that saved it.
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the simulator without a display')
+    parser.add_argument('--seed', type=int, default=23423098, help='Seed for the random number generators')
+    parser.add_argument('--resume', default=None, help='Continue the run saved in this checkpoint file')
+    parser.add_argument('--mobility-cache', default='cache/mobility',
+                        help='Directory of cached mobility shared between runs, None disables it')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.resume is not None:
+        engine = Engine.restore(args.resume)
+    else:
+        config = Config(mobility_cache=None if args.mobility_cache == 'None' else args.mobility_cache)
+        engine = EventEngine(args.seed, config) if config.engine == 'event' else Engine(args.seed, config)
+    engine.run()
+    engine.exit_handler()
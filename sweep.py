@@ -0,0 +1,63 @@
+import argparse
+import os
+
+from core.sweep import run_sweep, run_warm_sweep
+
+"""
+Sweep entry point
+
+Runs every combination of the given Config values for every seed, in parallel on
+all cores, e.g.
+
+    python sweep.py --grid strategy=mbf,prophet,random --grid h_factor=0.5,1 --grid contact_plan=True --seeds 1 2 3
+
+With --burn-in, every seed runs one shared burn-in and the grid points continue
+from it in forked processes, so they are compared on the same mobility and
+traffic. Only forwarding fields can be swept then, e.g.
+
+    python sweep.py --grid strategy=mbf,prophet,random --grid max_queue_length=15,30 --burn-in 20000
+"""
+
+
+def parse_value(value):
+    if value in ('True', 'False', 'None'):
+        return {'True': True, 'False': False, 'None': None}[value]
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_grid(entries):
+    grid = {}
+    for entry in entries:
+        name, _, values = entry.partition('=')
+        if not values:
+            raise ValueError(f'Expected field=value[,value...], got {entry}')
+        grid[name] = [parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run a parameter sweep of headless simulations')
+    parser.add_argument('--grid', action='append', default=[], help='Config field and values, e.g. h_factor=0.5,1')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[23423098], help='Seeds to run every grid point with')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all cores)')
+    parser.add_argument('--burn-in', type=int, default=None,
+                        help='ms of shared burn-in per seed to fork the grid points from (default: no warm start)')
+    parser.add_argument('--name', default='sweep', help='Name of the sweep, results go to results/<name>/')
+    parser.add_argument('--mobility-cache', default='cache/mobility',
+                        help='Directory of cached mobility shared between runs, None disables it')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    base = {'mobility_cache': parse_value(args.mobility_cache)}
+    if args.burn_in is not None:
+        run_warm_sweep(parse_grid(args.grid), args.seeds, args.burn_in, os.path.join('results', args.name), args.workers,
+                       base)
+    else:
+        run_sweep(parse_grid(args.grid), args.seeds, os.path.join('results', args.name), args.workers, base)
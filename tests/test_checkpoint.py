@@ -0,0 +1,54 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.event_engine import EventEngine
+from core.packet_trace import load_trace
+
+"""
+A run resumed from a checkpoint must end exactly like the run that wrote the
+checkpoint, including its packet trace
+"""
+
+SEED = 23423098
+
+
+def summary(engine):
+    summary = engine.summary()
+    summary.pop('end_time')  # Wall clock
+    return summary
+
+
+@pytest.mark.parametrize('engine_type, strategy, overrides', [
+    ('tick', 'mbf', {}),
+    ('tick', 'mbf', {'mbf_delta_updates': True, 'array_backed_nodes': True}),
+    ('tick', 'prophet', {}),
+    ('tick', 'random', {'contact_plan': True}),
+    ('event', 'mbf', {}),
+    ('event', 'prophet', {}),
+])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, engine_type, strategy, overrides):
+    config = Config(engine=engine_type, strategy=strategy, n_nodes=50, max_sim_time=30_000,
+                    checkpoint=str(tmp_path / 'checkpoints'), checkpoint_interval=12_000,
+                    packet_trace=str(tmp_path / 'traces'), mobility_cache=None, results_path=str(tmp_path),
+                    **overrides)
+    engine = (EventEngine if engine_type == 'event' else Engine)(SEED, config, result_files=False)
+    engine.run()
+    expected = summary(engine)
+    engine.finish()  # Flushes the trace
+    # A copy, the resumed run rewrites the same trace file from the checkpoint on
+    expected_trace = np.array(load_trace(engine.trace_path))
+
+    # The checkpoint holds the last state saved before the end of the run
+    [path] = glob.glob(os.path.join(config.checkpoint, '*.ckpt'))
+    resumed = Engine.restore(path)
+    assert 0 < resumed.sim_time < config.max_sim_time
+    assert type(resumed) is type(engine)
+    resumed.run()
+    assert summary(resumed) == expected
+    resumed.finish()
+    assert np.array_equal(np.array(load_trace(resumed.trace_path)), expected_trace)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+
+"""
+Replaying a contact plan (core.contact_plan) must give exactly the link events and
+results of discovering links every tick
+"""
+
+SEED = 10
+
+
+def config(tmp_path, strategy, array_backed_nodes, contact_plan):
+    return Config(strategy=strategy, n_nodes=100, max_sim_time=30_000, array_backed_nodes=array_backed_nodes,
+                  contact_plan=contact_plan, mobility_cache=None, results_path=str(tmp_path))
+
+
+def summary(engine):
+    engine.run()
+    summary = engine.summary()
+    summary.pop('end_time')  # Wall clock
+    return summary
+
+
+@pytest.mark.parametrize('array_backed_nodes', [False, True])
+@pytest.mark.parametrize('strategy', ['mbf', 'prophet', 'random'])
+def test_replayed_run_matches_live_run(tmp_path, strategy, array_backed_nodes):
+    live = summary(Engine(SEED, config(tmp_path, strategy, array_backed_nodes, False), result_files=False))
+    assert live['total_sent'] > 0
+    replayed = summary(Engine(SEED, config(tmp_path, strategy, array_backed_nodes, True), result_files=False))
+    assert replayed == live
+
+
+@pytest.mark.parametrize('array_backed_nodes', [False, True])
+def test_plan_holds_the_discovered_link_events(tmp_path, array_backed_nodes):
+    plan = Engine(SEED, config(tmp_path, 'random', array_backed_nodes, True), result_files=False).contact_plan
+    engine = Engine(SEED, config(tmp_path, 'random', array_backed_nodes, False), result_files=False)
+    discover_links = engine.discover_links
+    events = []
+
+    def recording_discover_links():
+        events.append(discover_links())
+        return events[-1]
+    engine.discover_links = recording_discover_links
+    engine.run()
+
+    for step, (links_up, links_down) in enumerate(events):
+        planned_up, planned_down = plan.events(step)
+        assert np.array_equal(links_up, planned_up), f'Links up differ at tick {step}'
+        assert np.array_equal(links_down, planned_down), f'Links down differ at tick {step}'
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.simulator_entities import Coordinate
+from core.spatial import SpatialGrid
+
+"""
+A run is fully determined by its seed and config, whatever else happens in the
+same process
+"""
+
+SEED = 23423098
+
+
+def config(tmp_path, **overrides):
+    return Config(**{'n_nodes': 50, 'max_sim_time': 20_000, 'mobility_cache': None, 'results_path': str(tmp_path),
+                     **overrides})
+
+
+def summary(engine):
+    summary = engine.summary()
+    summary.pop('end_time')  # Wall clock
+    return summary
+
+
+def solo_summary(seed, config):
+    engine = Engine(seed, config, result_files=False)
+    engine.run()
+    return summary(engine)
+
+
+def test_interleaved_runs_match_solo_runs(tmp_path):
+    configs = [config(tmp_path, strategy='prophet'),
+               config(tmp_path, strategy='mbf', array_backed_nodes=True, max_sim_time=15_000)]
+    seeds = [SEED, SEED + 1]
+    expected = [solo_summary(seed, run_config) for seed, run_config in zip(seeds, configs)]
+
+    engines = [Engine(seed, run_config, result_files=False) for seed, run_config in zip(seeds, configs)]
+    while not all(engine.is_finished() for engine in engines):
+        for engine in engines:
+            if not engine.is_finished():
+                engine.step()
+    assert [summary(engine) for engine in engines] == expected
+
+
+class LinkNode:
+    """
+    Stand-in for a node, for link keys of node indices no run here gets to
+    """
+    def __init__(self, index, x):
+        self.index = index
+        self.coordinate = Coordinate(x, 0.0)
+        self.nodes_in_range = []
+        self.prophet_old_nodes_in_range = []
+
+
+def test_link_keys_round_trip_large_node_indices(tmp_path):
+    engine = Engine(SEED, config(tmp_path, n_nodes=2), result_files=False)
+    linked = [(0, 2**16), (7, 2**16 + 1), (2**16 + 2, 70_001)]
+    engine.nodes = [LinkNode(index, 10_000.0 * index) for index in range(70_002)]
+    engine.grid = SpatialGrid(engine.grid.cell_size)
+    for pair, (first, second) in enumerate(linked):
+        # Both ends of every pair close together, far from all other nodes
+        for offset, index in ((0.0, first), (10.0, second)):
+            engine.nodes[index].coordinate = Coordinate(1_000.0 * pair + offset, 0.0)
+            engine.grid.insert(engine.nodes[index])
+
+    links_up, links_down = engine.discover_links()
+    assert len(links_down) == 0
+    assert [(key >> 32, key & 0xFFFFFFFF) for key in links_up.tolist()] == linked
+    changed = engine.apply_link_events(links_up, links_down)
+    assert [node.index for node in changed] == sorted(index for pair in linked for index in pair)
+    for first, second in linked:
+        assert engine.nodes[first].nodes_in_range == [engine.nodes[second]]
+        assert engine.nodes[second].nodes_in_range == [engine.nodes[first]]
+
+    # Keys of the largest indices keys can hold
+    first, second = np.array([2**31 - 2, 5]), np.array([2**31 - 1, 2**32 - 1])
+    keys = (first << 32) | second
+    assert np.array_equal(keys >> 32, first) and np.array_equal(keys & 0xFFFFFFFF, second)
+
+
+class FakeRoot:
+    """
+    Tk root that runs scheduled callbacks when asked instead of in an event loop
+    """
+    def __init__(self):
+        self.scheduled = []
+        self.destroyed = False
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class FakeCanvas:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def test_gui_loop_matches_headless_run(tmp_path):
+    pytest.importorskip('PIL')
+    pytest.importorskip('tkinter')
+    from graphics.display import Simulator
+
+    run_config = config(tmp_path, strategy='mbf')
+    headless = solo_summary(SEED, run_config)
+    assert solo_summary(SEED, run_config) == headless  # Same seed, same run
+
+    # The display's own tick loop, with a root and canvas that do not need a display
+    simulator = Simulator.__new__(Simulator)
+    simulator.config = run_config
+    simulator.tk_ids = {}
+    simulator.root = FakeRoot()
+    simulator.canvas = FakeCanvas()
+    simulator.node_size = 10
+    simulator.waypoint_size = 5
+    simulator.paused = False
+    Engine.__init__(simulator, SEED, run_config, result_files=False)
+    assert len(simulator.tk_ids) == run_config.n_nodes
+
+    simulator.simulation_loop()
+    while simulator.root.scheduled:
+        simulator.root.scheduled.pop(0)()
+    assert simulator.root.destroyed
+    assert summary(simulator) == headless
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.event_engine import EventEngine
+from core.simulator_entities import Coordinate
+from core.types import EventType
+
+"""
+The event engine models the same network as the tick engine, delivered counts
+differ by about as much as between seeds (see EventEngine)
+"""
+
+SEED = 1
+
+
+def summary(engine_type, strategy):
+    config = Config(engine=engine_type, strategy=strategy, max_sim_time=30_000, mobility_cache=None)
+    engine = (EventEngine if engine_type == 'event' else Engine)(SEED, config, result_files=False)
+    engine.run()
+    return engine.summary()
+
+
+@pytest.mark.parametrize('strategy', ['random', 'mbf', 'prophet'])
+def test_event_results_stay_close_to_tick_results(strategy):
+    tick, event = summary('tick', strategy), summary('event', strategy)
+    assert event['success_count'] == pytest.approx(tick['success_count'], rel=0.15)
+    # Transmissions take tx_time instead of whole ticks, packets that do not reach their destination run into the
+    # hop limit sooner
+    assert event['failure_hop_limit'] <= 5 * tick['failure_hop_limit'] + 20
+
+
+class ScenarioEngine(EventEngine):
+    """
+    Two nodes instead of generated ones: node 0 stands still at (100, 100) and
+    generates one packet for node 1 at 1 s, node 1 starts at (400, 100) and moves
+    left at 100 px/s towards its only waypoint (0, 100)
+    """
+    def initialize_nodes(self):
+        sender = self.create_node(coordinate=Coordinate(100.0, 100.0), velocity=0.0,
+                                  waypoints=np.array([[100.0, 100.0]]))
+        receiver = self.create_node(coordinate=Coordinate(400.0, 100.0), velocity=100.0,
+                                    waypoints=np.array([[0.0, 100.0]]))
+        sender.all_node_ids = [receiver.id]  # Every packet of the sender goes to the receiver
+        receiver.all_node_ids = [sender.id, receiver.id]
+        sender.gen_timestamps, receiver.gen_timestamps = [1_000], []
+        self.handled = []
+
+    def handle(self, event_type, data):
+        self.handled.append((self.sim_time, event_type))
+        super().handle(event_type, data)
+
+
+def test_event_order_and_times_of_a_hand_built_scenario():
+    config = Config(engine='event', strategy='random', max_sim_time=5_000, mobility_cache=None)
+    engine = ScenarioEngine(SEED, config, result_files=False)
+    engine.run()
+
+    # No relay at 1 s and no retry until the link comes up when node 1 is 75 px away, after 225 px. The
+    # transmission takes tx_time, and node 1 stops 100 px before its waypoint, like in the tick engine
+    assert [event_type for _, event_type in engine.handled] == [
+        EventType.PACKET_GENERATION, EventType.LINK_UP, EventType.TRANSMISSION_COMPLETE, EventType.WAYPOINT_ARRIVAL]
+    assert [time for time, _ in engine.handled] == pytest.approx([1_000, 2_250, 2_350, 3_000], abs=1e-6)
+    assert engine.summary()['success_count'] == 1
+    assert engine.nodes[1].finished
@@ -0,0 +1,47 @@
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+
+"""
+Delta-encoded MBF traffic updates (Config.mbf_delta_updates) must leave every node
+with the same estimations as sending the full table and merging it by timestamp.
+Full-table updates as sent by default overwrite newer estimations with older ones,
+delta updates never do
+"""
+
+SEED = 23423098
+
+
+def estimations(tmp_path, mbf_delta_updates, array_backed_nodes, merge=False):
+    """
+    Run to the end, return the estimations of every node as plain values. With merge,
+    full tables are merged by timestamp like delta updates
+    """
+    config = Config(strategy='mbf', n_nodes=60, max_sim_time=30_000, mbf_delta_updates=mbf_delta_updates,
+                    array_backed_nodes=array_backed_nodes, mobility_cache=None, results_path=str(tmp_path))
+    engine = Engine(SEED, config, result_files=False)
+    if merge:
+        for node in engine.nodes:
+            node.update_traffic_table = node.update_traffic_table_mbf_delta
+    engine.run()
+    return {node.id: {node_id: (payload.coordinate.x, payload.coordinate.y, payload.vector.velocity,
+                                payload.vector.heading, payload.timestamp)
+                      for node_id, payload in node.node_estimations.items()}
+            for node in engine.nodes}
+
+
+@pytest.mark.parametrize('array_backed_nodes', [False, True])
+def test_delta_updates_match_merged_full_updates(tmp_path, array_backed_nodes):
+    merged = estimations(tmp_path, False, array_backed_nodes, merge=True)
+    assert sum(len(table) for table in merged.values()) > 0
+    assert estimations(tmp_path, True, array_backed_nodes) == merged
+
+
+def test_delta_updates_are_never_older_than_full_updates(tmp_path):
+    full = estimations(tmp_path, False, False)
+    delta = estimations(tmp_path, True, False)
+    for node_id, table in full.items():
+        assert delta[node_id].keys() == table.keys()
+        for other_id, estimation in table.items():
+            assert delta[node_id][other_id][4] >= estimation[4]
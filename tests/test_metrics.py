@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.metrics import RunningStats, Histogram, Metrics
+from core.packet_trace import load_trace, packet_delays
+
+"""
+Online metrics (core.metrics) must agree with statistics computed offline from all
+recorded samples
+"""
+
+SEED = 23423098
+QUANTILES = (0.1, 0.5, 0.9, 0.99)
+
+
+def test_running_stats_match_numpy():
+    samples = np.random.default_rng(3).exponential(2_000, 5_000)
+    stats = RunningStats()
+    for value in samples.tolist():
+        stats.add(value)
+    assert stats.count == len(samples)
+    assert stats.total == pytest.approx(samples.sum())
+    assert stats.mean == pytest.approx(samples.mean())
+    assert stats.variance() == pytest.approx(samples.var(ddof=1))
+    assert stats.std() == pytest.approx(samples.std(ddof=1))
+
+    single = RunningStats()
+    single.add(1.0)
+    assert single.variance() is None and single.std() is None
+
+
+def test_histogram_quantiles_match_numpy():
+    bin_width = 100
+    samples = np.random.default_rng(5).gamma(2, 1_500, 5_000)
+    histogram = Histogram(bin_width, samples.max() + bin_width)
+    for value in samples.tolist():
+        histogram.add(value)
+    for q in QUANTILES:
+        # Within the bin of the smallest sample with at least q of the samples at or below it
+        assert histogram.quantile(q) == pytest.approx(np.quantile(samples, q, method='inverted_cdf'), abs=bin_width)
+    assert Histogram(bin_width, 1_000).quantile(0.5) is None
+
+
+def test_run_metrics_match_recorded_delays(tmp_path):
+    config = Config(strategy='mbf', n_nodes=50, max_sim_time=30_000, packet_trace=str(tmp_path),
+                    mobility_cache=None, results_path=str(tmp_path))
+    engine = Engine(SEED, config, result_files=False)
+    engine.run()
+    engine.finish()
+    _, delays, hop_counts = packet_delays(load_trace(engine.trace_path))
+    metrics = engine.metrics
+    assert len(delays) == metrics.delivered > 1
+
+    assert metrics.delay.mean == pytest.approx(delays.mean())
+    assert metrics.delay.std() == pytest.approx(delays.std(ddof=1))
+    assert metrics.hops.mean == pytest.approx(hop_counts.mean())
+    assert metrics.hops.std() == pytest.approx(hop_counts.std(ddof=1))
+    for q in QUANTILES:
+        assert metrics.delay_histogram.quantile(q) == pytest.approx(
+            np.quantile(delays, q, method='inverted_cdf'), abs=config.metrics_delay_bin)
+        assert metrics.hop_histogram.quantile(q) == pytest.approx(
+            np.quantile(hop_counts, q, method='inverted_cdf'), abs=1)
+
+
+def test_snapshots():
+    metrics = Metrics(Config(metrics_snapshot_interval=1_000))
+    metrics.sent = 4
+    metrics.observe(500)
+    assert metrics.snapshots == []
+    metrics.packet_delivered(200, 2)
+    metrics.observe(2_000)
+    assert metrics.snapshots == [(1_000, 4, 1, 0.25, 200), (2_000, 4, 1, 0.25, 200)]
+    table = Metrics(Config()).snapshot_table()
+    assert all(len(column) == 0 for column in table.values())
+
+
+def test_nodes_share_the_run_metrics(tmp_path):
+    # Packet ids are numbered by the shared Metrics
+    engine = Engine(SEED, Config(n_nodes=20, mobility_cache=None, results_path=str(tmp_path)), result_files=False)
+    assert all(node.metrics is engine.metrics for node in engine.nodes)
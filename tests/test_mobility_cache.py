@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.mobility_cache import cached_mobility
+from core.node_factory import generate_mobility
+from core.random_streams import NodeStreams
+
+"""
+Cached mobility (core.mobility_cache) must be exactly the generated mobility, shared
+by runs with the same seed and mobility config only
+"""
+
+SEED = 23423098
+
+
+def mobility_config(tmp_path, **overrides):
+    return Config(n_nodes=20, num_waypoints=30, mobility_cache=str(tmp_path / 'cache'), **overrides)
+
+
+class Generator:
+    """
+    Generates the mobility of a run like Engine.initialize_nodes() and counts calls
+    """
+    def __init__(self, config, seed=SEED):
+        self.config = config
+        self.seed = seed
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return generate_mobility(self.config, [NodeStreams(self.seed, index).waypoints
+                                               for index in range(self.config.n_nodes)])
+
+
+def entries(tmp_path):
+    return sorted(os.listdir(tmp_path / 'cache'))
+
+
+def test_hit_returns_memory_mapped_generated_arrays(tmp_path):
+    config = mobility_config(tmp_path)
+    generate = Generator(config)
+    fresh = generate()
+    first = cached_mobility(config, SEED, generate)
+    cached = cached_mobility(config, SEED, generate)
+    assert generate.calls == 2  # Once above, once for the miss
+    for fresh_array, first_array, cached_array in zip(fresh, first, cached):
+        assert isinstance(cached_array, np.memmap)
+        assert np.array_equal(cached_array, fresh_array)
+        assert np.array_equal(first_array, fresh_array)
+
+
+def test_changed_mobility_field_misses(tmp_path):
+    generate = Generator(mobility_config(tmp_path))
+    cached_mobility(generate.config, SEED, generate)
+    other = Generator(mobility_config(tmp_path, h_factor=0.5))
+    coordinates, _, waypoints = cached_mobility(other.config, SEED, other)
+    assert other.calls == 1
+    assert len(entries(tmp_path)) == 2
+    # Another seed misses as well
+    cached_mobility(generate.config, SEED + 1, Generator(generate.config, SEED + 1))
+    assert len(entries(tmp_path)) == 3
+
+
+def test_changed_strategy_hits(tmp_path):
+    generate = Generator(mobility_config(tmp_path))
+    cached_mobility(generate.config, SEED, generate)
+    other = Generator(mobility_config(tmp_path, strategy='prophet', max_queue_length=30))
+    cached_mobility(other.config, SEED, other)
+    assert other.calls == 0
+
+
+def test_entries_are_written_atomically(tmp_path, monkeypatch):
+    config = mobility_config(tmp_path)
+    generate = Generator(config)
+    saved = []
+    save = np.save
+
+    def failing_save(path, array):
+        if saved:
+            raise OSError('Disk full')
+        saved.append(path)
+        save(path, array)
+    monkeypatch.setattr(np, 'save', failing_save)
+    with pytest.raises(OSError):
+        cached_mobility(config, SEED, generate)
+    # Neither a partial entry nor the staging directory is left behind
+    assert entries(tmp_path) == []
+
+    monkeypatch.setattr(np, 'save', save)
+    cached_mobility(config, SEED, generate)
+    [entry] = entries(tmp_path)
+    assert sorted(os.listdir(tmp_path / 'cache' / entry)) == ['coordinates.npy', 'velocities.npy', 'waypoints.npy']
+
+
+def test_concurrently_cached_entry_is_kept(tmp_path, monkeypatch):
+    config = mobility_config(tmp_path)
+    cached_mobility(config, SEED, Generator(config))
+    [entry] = entries(tmp_path)
+    before = os.stat(tmp_path / 'cache' / entry / 'waypoints.npy').st_mtime_ns
+
+    # Another run misses at the same time and finishes second, its rename fails
+    isdir = os.path.isdir
+    monkeypatch.setattr(os.path, 'isdir', lambda path: not path.endswith(entry) and isdir(path))
+    coordinates, _, _ = cached_mobility(config, SEED, Generator(config))
+    assert entries(tmp_path) == [entry]
+    assert os.stat(tmp_path / 'cache' / entry / 'waypoints.npy').st_mtime_ns == before
+    assert len(coordinates) == config.n_nodes
+
+
+def test_cache_is_off_by_default():
+    generate = Generator(Config(n_nodes=5))
+    cached_mobility(generate.config, SEED, generate)
+    cached_mobility(generate.config, SEED, generate)
+    assert Config.mobility_cache is None and generate.calls == 2
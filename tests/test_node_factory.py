@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.node_factory import generate_waypoint_array, generate_waypoint_arrays, generate_mobility, generate_coordinate
+from core.random_streams import generator
+
+"""
+The batch waypoint generator must give every node the waypoints the scalar
+generator gives it, with the same random generator
+"""
+
+SEED = 23423098
+
+
+@pytest.mark.parametrize('h_factor', [0.2, 0.5, 1])  # With 0 the heading never changes after leaving the area
+def test_batch_waypoints_match_scalar_waypoints(h_factor):
+    config = Config(width=300, height=300)  # Small area, so that many candidate points fall outside and are redrawn
+    starts = [generate_coordinate(config.width, config.height, rng=generator(SEED, 0, index)) for index in range(25)]
+    batch = generate_waypoint_arrays([(start.x, start.y) for start in starts], 40, h_factor, h_factor, config,
+                                     [generator(SEED, 1, index) for index in range(len(starts))])
+    for index, start in enumerate(starts):
+        scalar = generate_waypoint_array(start, 40, h_factor, h_factor, config, generator(SEED, 1, index))
+        assert batch[index].tolist() == [[waypoint.x, waypoint.y] for waypoint in scalar]
+
+
+def test_generate_mobility_matches_scalar_generation():
+    # Per node: start coordinate, start velocity, then waypoints, all drawn from the node's generator
+    config = Config()
+    batch_rngs = [generator(SEED, 1, index) for index in range(10)]
+    coordinates, velocities, waypoints = generate_mobility(config, batch_rngs)
+    for index in range(10):
+        rng = generator(SEED, 1, index)
+        start = generate_coordinate(config.width, config.height, rng=rng)
+        velocity = rng.uniform(config.min_node_velocity, config.max_node_velocity)
+        scalar = generate_waypoint_array(start, config.num_waypoints, config.h_factor, config.h_factor, config, rng)
+        assert tuple(coordinates[index]) == (start.x, start.y)
+        assert velocities[index] == velocity
+        assert np.array_equal(waypoints[index], [(waypoint.x, waypoint.y) for waypoint in scalar])
@@ -0,0 +1,53 @@
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+
+"""
+Array-backed nodes (core.node_store) must move exactly like object nodes, tick by
+tick, and give the same run results
+"""
+
+SEED = 23423098
+
+
+def run(tmp_path, array_backed_nodes, strategy):
+    """
+    Run to the end, return the mobility state and heading of every node after every
+    tick, and the summary
+    """
+    config = Config(n_nodes=40, max_sim_time=20_000, strategy=strategy, array_backed_nodes=array_backed_nodes,
+                    mobility_cache=None, results_path=str(tmp_path))
+    engine = Engine(SEED, config, result_files=False)
+    ticks, headings = [], []
+    while not engine.is_finished():
+        engine.step()
+        ticks.append([(node.coordinate.x, node.coordinate.y, node.vector.velocity, node.waypointer, node.finished)
+                      for node in engine.nodes])
+        headings.append([node.vector.heading for node in engine.nodes])
+    summary = engine.summary()
+    summary.pop('end_time')  # Wall clock
+    return ticks, headings, summary
+
+
+@pytest.mark.parametrize('strategy', ['random', 'mbf'])
+def test_array_nodes_move_like_object_nodes(tmp_path, strategy):
+    object_ticks, object_headings, object_summary = run(tmp_path, False, strategy)
+    array_ticks, array_headings, array_summary = run(tmp_path, True, strategy)
+    assert len(object_ticks) == len(array_ticks)
+    for step, (object_nodes, array_nodes) in enumerate(zip(object_ticks, array_ticks)):
+        assert object_nodes == array_nodes, f'Nodes differ after tick {step}'
+        # NumPy's arctan2 may differ from math.atan2 in the last bit, positions are rounded to the granularity
+        assert object_headings[step] == pytest.approx(array_headings[step], rel=1e-12, abs=1e-12)
+    assert object_summary == array_summary
+
+
+@pytest.mark.parametrize('seed', [10, SEED])
+def test_grid_follows_array_nodes(tmp_path, seed):
+    config = Config(n_nodes=100, max_sim_time=20_000, array_backed_nodes=True, mobility_cache=None,
+                    results_path=str(tmp_path))
+    engine = Engine(seed, config, result_files=False)
+    for _ in range(3):
+        engine.step()
+        for node in engine.nodes:
+            assert engine.grid.node_cells[node] == engine.grid.cell_of(node.coordinate), f'{node.id} in a stale cell'
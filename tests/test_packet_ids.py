@@ -0,0 +1,62 @@
+import pytest
+
+from core.config import Config
+from core.packet_queue import PacketQueue
+from core.simulator_entities import Coordinate, Node, Packet, QueueItem, RadioTask
+from core.types import PacketType
+
+"""
+Queued and delivered packets are tracked by packet id: a node holds at most one
+copy of a packet, and counts every packet delivered to it once
+"""
+
+
+def data_packet(packet_id, dst, c_time=0):
+    return Packet(p_type=PacketType.DATA, src='Node_9', dst=dst, c_time=c_time, hop_count=0, tx_time=100,
+                  tx_mode='unicast', id=packet_id)
+
+
+def node():
+    node = Node('Node_0', Coordinate(0, 0), 1, config=Config(strategy='random'))
+    node.gen_timestamps = []
+    return node
+
+
+def test_queue_membership_follows_push_pop_and_expire():
+    queue = PacketQueue()
+    items = [QueueItem(data_packet(packet_id, 'Node_1', c_time=packet_id * 100), 0) for packet_id in range(4)]
+    for item in items:
+        queue.push(item)
+    assert all(packet_id in queue for packet_id in range(4)) and 4 not in queue
+    with pytest.raises(ValueError):
+        queue.push(QueueItem(data_packet(2, 'Node_1'), 0))
+
+    assert queue.pop() is items[0] and 0 not in queue
+    queue.remove(items[2])
+    assert 2 not in queue
+    assert queue.expire(200) == [items[1]]
+    assert [packet_id for packet_id in range(4) if packet_id in queue] == [3]
+
+
+def test_node_keeps_one_copy_of_a_packet():
+    relay = node()
+    packet = data_packet(7, 'Node_1')
+    relay.receive(packet)
+    relay.receive(packet)  # From another neighbor
+    assert len(relay.queue) == 1 and 7 in relay.queue
+
+    # Neither queued again while it is the radio task
+    relay.radioTask = RadioTask(relay.queue.pop(), relay=None)
+    relay.receive(packet)
+    assert len(relay.queue) == 0
+
+
+def test_delivered_packets_are_counted_once():
+    destination = node()
+    first, second = data_packet(1, 'Node_0'), data_packet(2, 'Node_0')
+    for packet in (first, first, second, first):
+        destination.receive(packet)
+    assert destination.received_ids == {1, 2}
+    assert destination.metrics.delivered == 2
+    assert destination.metrics.duplicates == 2
+    assert len(destination.queue) == 0
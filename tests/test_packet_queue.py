@@ -0,0 +1,56 @@
+from core.config import Config
+from core.packet_queue import PacketQueue
+from core.simulator_entities import Coordinate, Node, Packet, QueueItem, RadioTask
+from core.types import PacketType
+
+"""
+A packet put back into the queue because no relay was found for it goes behind
+the other packets, instead of coming straight back out of the priority heap
+"""
+
+DESTINATIONS = ['Node_1', 'Node_2', 'Node_3', 'Node_4']
+
+
+def queue_item(packet_id, dst):
+    packet = Packet(p_type=PacketType.DATA, src='Node_0', dst=dst, c_time=0, hop_count=0, tx_time=100,
+                    tx_mode='unicast', id=packet_id)
+    return QueueItem(packet, 0)
+
+
+def test_item_pushed_to_the_back_waits_for_the_others():
+    keys = {dst: index for index, dst in enumerate(DESTINATIONS)}  # Lower keys first, Node_1 first
+    queue = PacketQueue(key=lambda item: keys[item.packet.dst])
+    for packet_id, dst in enumerate(DESTINATIONS):
+        queue.push(queue_item(packet_id, dst))
+
+    order = []
+    for _ in range(2 * len(DESTINATIONS)):
+        item = queue.pop()
+        order.append(item.packet.dst)
+        queue.push(item, back=True)
+    assert order == DESTINATIONS * 2
+
+    # reprioritize() puts items pushed to the back in their place again
+    queue.reprioritize([])
+    assert [item.packet.dst for item in queue] == DESTINATIONS
+
+
+def test_failed_prophet_packet_does_not_block_the_queue():
+    config = Config(strategy='prophet')
+    node = Node('Node_0', Coordinate(0, 0), 1, config=config)
+    node.prophet_init({node_id: index for index, node_id in enumerate(['Node_0'] + DESTINATIONS)})
+    node.gen_timestamps = []
+    for index, dst in enumerate(DESTINATIONS):
+        node.node_estimations[dst] = 0.5 - 0.1 * index  # Node_1 has the highest predictability
+
+    items = [queue_item(packet_id, dst) for packet_id, dst in enumerate(DESTINATIONS)]
+    node.radioTask = RadioTask(items[0], relay=None)
+    for item in items[1:]:
+        node.queue_insert(item)
+
+    # No neighbors, so no relay is found for any packet and every tick tries the next one
+    tried = []
+    for _ in range(2 * len(DESTINATIONS)):
+        node.update_core()
+        tried.append(node.radioTask.queue_item.packet.dst)
+    assert tried == (DESTINATIONS[1:] + DESTINATIONS[:1]) * 2
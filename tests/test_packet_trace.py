@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.packet_trace import (load_trace, packet_delays, packet_paths, CREATED, TRANSMITTED, DELIVERED, DUPLICATE,
+                               DROP_HOP_LIMIT, DROP_TIME_LIMIT, DROP_TX_LIMIT, DROP_QUEUE_LIMIT)
+
+"""
+The packet trace (core.packet_trace) of a run must hold the same packets, drops and
+delays as the run's Metrics
+"""
+
+SEED = 23423098
+
+
+@pytest.mark.parametrize('strategy, background', [('mbf', False), ('prophet', True), ('random', False)])
+def test_trace_matches_metrics(tmp_path, strategy, background):
+    config = Config(strategy=strategy, n_nodes=50, max_sim_time=30_000, max_queue_length=5, max_tx_failure=100,
+                    packet_trace=str(tmp_path), packet_trace_background=background, mobility_cache=None,
+                    results_path=str(tmp_path))
+    engine = Engine(SEED, config, result_files=False)
+    engine.run()
+    engine.finish()
+    metrics = engine.metrics
+    trace = load_trace(engine.trace_path)
+
+    counts = np.bincount(trace['event'], minlength=DROP_QUEUE_LIMIT + 1)
+    assert counts[CREATED] == metrics.sent
+    assert counts[DELIVERED] == metrics.delivered > 0
+    assert counts[DUPLICATE] == metrics.duplicates
+    assert counts[DROP_HOP_LIMIT] == metrics.failure_hop_limit
+    assert counts[DROP_TIME_LIMIT] == metrics.failure_time_limit
+    assert counts[DROP_TX_LIMIT] == metrics.failure_tx_limit
+    assert counts[DROP_QUEUE_LIMIT] == metrics.failure_queue_limit
+
+    packets, delays, hop_counts = packet_delays(trace)
+    assert len(set(packets.tolist())) == len(packets)
+    assert delays.sum() == pytest.approx(metrics.delay.total)
+    assert delays.mean() == pytest.approx(metrics.delay.mean)
+    assert hop_counts.sum() == metrics.hops.total
+
+    # Every delivery is recorded right after the transmission that reached the destination
+    delivered = np.flatnonzero(trace['event'] == DELIVERED)
+    hop = trace[delivered - 1]
+    assert np.all(hop['event'] == TRANSMITTED)
+    assert np.array_equal(hop['packet'], trace['packet'][delivered])
+    assert np.array_equal(hop['peer'], trace['node'][delivered])
+
+    created = trace[trace['event'] == CREATED]
+    sources = dict(zip(created['packet'].tolist(), created['node'].tolist()))
+    destinations = dict(zip(created['packet'].tolist(), created['peer'].tolist()))
+    paths = packet_paths(trace)
+    for packet in packets.tolist():
+        path = paths[packet]
+        # The path reaches the destination, copies may still travel on afterwards
+        arrival = [receiver for _, receiver in path].index(destinations[packet])
+        assert path[0][0] == sources[packet]
+        # Up to the delivery, every hop starts at a node the packet had already reached
+        reached = {sources[packet]}
+        for sender, receiver in path[:arrival + 1]:
+            assert sender in reached
+            reached.add(receiver)
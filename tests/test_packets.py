@@ -0,0 +1,32 @@
+import pytest
+
+from core.simulator_entities import Packet, MobilityPayload, Coordinate, Vector
+from core.types import PacketType
+
+"""
+Packets are shared between nodes (core.simulator_entities.Packet): every hop
+works on its own copy, and payloads cannot be changed through any of them
+"""
+
+
+def test_forwarded_copy_does_not_change_the_original():
+    payload = {'Node_1': MobilityPayload(Coordinate(1, 2), Vector(10, 0), 0)}
+    packet = Packet(p_type=PacketType.TRAFFIC_UPDATE, src='Node_0', dst=None, c_time=50, hop_count=0, tx_time=0,
+                    tx_mode='broadcast', payload=payload)
+    copy = packet.forward()
+    assert copy is not packet
+    assert (copy.p_type, copy.src, copy.dst, copy.c_time, copy.tx_time, copy.tx_mode, copy.id) == \
+           (packet.p_type, packet.src, packet.dst, packet.c_time, packet.tx_time, packet.tx_mode, packet.id)
+    assert copy.hop_count == 1 and copy.payload is packet.payload
+
+    copy.hop_count = 5
+    copy.aether_time = 200
+    copy.dst = 'Node_2'
+    next_copy = copy.forward()
+    next_copy.hop_count = 9
+    assert (packet.hop_count, packet.aether_time, packet.dst) == (0, None, None)
+    assert copy.hop_count == 5 and next_copy.aether_time is None
+
+    with pytest.raises(TypeError):
+        copy.payload['Node_3'] = payload['Node_1']
+    assert list(packet.payload) == ['Node_1']
@@ -0,0 +1,66 @@
+import collections
+import functools
+
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.simulator_entities import Node
+
+"""
+The profiler (core.profiling) must count every call of the profiled phases, and
+leave the engine and its nodes as they were without profiling once the run is done
+"""
+
+SEED = 23423098
+
+
+def count_calls(monkeypatch, cls, names, prefix=''):
+    """
+    Count the calls of the named methods of cls, by phase name
+    """
+    calls = collections.Counter()
+    for name in names:
+        method = getattr(cls, name)
+
+        def counted(*args, _method=method, _phase=prefix + name, **kwargs):
+            calls[_phase] += 1
+            return _method(*args, **kwargs)
+        monkeypatch.setattr(cls, name, functools.wraps(method)(counted))
+    return calls
+
+
+@pytest.mark.parametrize('strategy', ['mbf', 'prophet'])
+def test_profiler_counts_real_calls_and_is_removed(tmp_path, monkeypatch, strategy):
+    # Strategy methods are counted under the phase name of the method that is bound
+    node_methods = ('update_core', f'select_relay_{strategy}', 'receive', f'update_traffic_table_{strategy}',
+                    'update_pos')
+    engine_calls = count_calls(monkeypatch, Engine, Engine.profiled_phases + ('step',))
+    node_calls = count_calls(monkeypatch, Node, node_methods, 'node.')
+
+    engine = Engine(SEED, Config(strategy=strategy, n_nodes=30, max_sim_time=10_000, results_path=str(tmp_path),
+                                 profile=str(tmp_path / 'profile')), result_files=False)
+    engine.run()
+    profiler = engine.profiler
+    profiler_calls = dict(profiler.total_calls)
+    expected = {**engine_calls, **node_calls}
+    assert profiler_calls == {phase: expected.get(phase, 0) for phase in profiler_calls}
+    assert profiler_calls['step'] == engine.step_count
+    assert profiler_calls['node.receive'] > 0
+    assert len(profiler.timeline) == engine.step_count
+    assert sum(row[2]['node.update_pos'] for row in profiler.timeline) == profiler_calls['node.update_pos']
+
+    engine.finish()
+    timeline = np.load(next((tmp_path / 'profile').iterdir()))
+    assert timeline['node.receive_calls'].sum() == profiler_calls['node.receive']
+
+    plain = Engine(SEED, Config(strategy=strategy, n_nodes=30, max_sim_time=10_000, results_path=str(tmp_path)),
+                   result_files=False)
+    for target, other in [(engine, plain)] + list(zip(engine.nodes, plain.nodes)):
+        for name in ('step',) + Engine.profiled_phases + Engine.profiled_node_phases:
+            if not hasattr(target, name):
+                continue
+            assert (name in vars(target)) == (name in vars(other)), f'{name} left on {target}'
+            if name in vars(target):
+                assert getattr(target, name).__func__ is getattr(other, name).__func__
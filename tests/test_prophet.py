@@ -0,0 +1,53 @@
+import numpy as np
+
+from core.prophet import ProphetTable
+
+"""
+Lazily aged predictabilities (core.prophet) must be bit-for-bit those of a table
+that is multiplied by gamma on every aging step
+"""
+
+GAMMA = 0.95
+P_INIT = 0.9
+BETA = 0.75
+
+
+def eager_encounter(values, src, own, src_vector):
+    # ProphetTable.encounter() on a table that is always aged up to date
+    values = values.copy()
+    values[src] = values[src] + (1 - values[src]) * P_INIT
+    updated = values + (1 - values) * values[src] * src_vector * BETA
+    updated[own] = values[own]
+    return updated
+
+
+def test_lazy_aging_matches_eager_aging():
+    rng = np.random.default_rng(7)
+    n = 30
+    node_indices = {f'Node_{index}': index for index in range(n)}
+    node_ids = list(node_indices)
+    own = 0
+    table = ProphetTable(node_indices, GAMMA)
+    eager = np.zeros(n)
+
+    for _ in range(200):
+        action = rng.integers(4)
+        if action == 0:
+            # Several aging steps in a row
+            for _ in range(rng.integers(1, 6)):
+                table.age()
+                eager = eager * GAMMA
+        elif action == 1:
+            src = int(rng.integers(1, n))
+            src_vector = rng.uniform(0, 1, n)
+            src_vector[src] = 0
+            table.encounter(node_ids[src], src_vector, node_ids[own], P_INIT, BETA)
+            eager = eager_encounter(eager, src, own, src_vector)
+        elif action == 2:
+            # Reading single entries leaves the table with entries that are behind by different steps
+            for index in rng.choice(n, 5, replace=False).tolist():
+                assert table[node_ids[index]] == eager[index]
+        else:
+            assert np.array_equal(table.vector(), eager)
+    assert np.array_equal(table.vector(), eager)
+    assert [table[node_id] for node_id in node_ids] == eager.tolist()
@@ -0,0 +1,51 @@
+import multiprocessing
+
+import numpy as np
+
+from core.config import Config
+from core.engine import Engine
+from core.random_streams import generator, NodeStreams, IDS, NODES, MOBILITY, TRAFFIC
+
+"""
+Every random stream (core.random_streams) only depends on the seed and its key: not
+on how much other streams draw, the order they are created in, the number of nodes
+or the process
+"""
+
+SEED = 23423098
+
+
+def draws(seed, index):
+    streams = NodeStreams(seed, index)
+    return [streams.mobility.random(5).tolist(), streams.traffic.integers(1_000, size=5).tolist(),
+            streams.relay.random(5).tolist(), streams.waypoints.random(5).tolist(), generator(seed, IDS).random()]
+
+
+def test_stream_does_not_depend_on_other_streams():
+    alone = generator(SEED, NODES, 3, TRAFFIC).random(10)
+
+    streams = [NodeStreams(SEED, index) for index in range(5)]
+    for node_streams in streams:
+        node_streams.mobility.random(1_000)  # Other subsystems and nodes draw more
+        node_streams.relay.integers(2, size=100)
+    generator(SEED, IDS).integers(0, 99999999, size=50)
+    assert np.array_equal(streams[3].traffic.random(10), alone)
+    # Other nodes and subsystems get other streams
+    assert not np.array_equal(streams[2].traffic.random(10), alone)
+    assert not np.array_equal(generator(SEED, NODES, 3, MOBILITY).random(10), alone)
+
+
+def test_same_seed_gives_same_draws_in_other_processes():
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        results = pool.starmap(draws, [(SEED, 7), (SEED, 7)])
+    assert results[0] == results[1] == draws(SEED, 7)
+    assert draws(SEED + 1, 7) != draws(SEED, 7)
+
+
+def test_node_streams_do_not_depend_on_the_number_of_nodes(tmp_path):
+    small = Engine(SEED, Config(n_nodes=20, results_path=str(tmp_path)), result_files=False)
+    large = Engine(SEED, Config(n_nodes=30, results_path=str(tmp_path)), result_files=False)
+    for node, other in zip(small.nodes, large.nodes):
+        assert node.id == other.id
+        assert node.gen_timestamps == other.gen_timestamps
+        assert node.waypoints == other.waypoints
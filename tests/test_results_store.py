@@ -0,0 +1,67 @@
+import multiprocessing
+
+import numpy as np
+
+from core.results_store import ResultsStore
+
+"""
+Rows appended to a results store, from any number of parts, must read back in
+append order with missing values encoded the same way in every column type
+"""
+
+
+def test_round_trip(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    store.append({'strategy': 'mbf', 'seed': 1, 'avg_delay': 1.5, 'array_backed_nodes': False})
+    store.append([{'strategy': 'prophet', 'seed': 2, 'avg_delay': 2.25, 'array_backed_nodes': True},
+                  {'strategy': 'random', 'seed': 3, 'avg_delay': 0.5, 'array_backed_nodes': False}])
+    table = store.read()
+    assert table['strategy'].tolist() == ['mbf', 'prophet', 'random']
+    assert table['seed'].dtype == np.int64 and table['seed'].tolist() == [1, 2, 3]
+    assert table['avg_delay'].tolist() == [1.5, 2.25, 0.5]
+    assert table['array_backed_nodes'].dtype == bool and table['array_backed_nodes'].tolist() == [False, True, False]
+
+
+def test_rows_read_in_append_order(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    for seed in range(20):
+        store.append({'seed': seed})
+        if seed == 9:
+            store.compact()
+    assert store.read()['seed'].tolist() == list(range(20))
+    # Reading again, after everything was compacted
+    assert store.read()['seed'].tolist() == list(range(20))
+
+
+def test_none_columns(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    # Columns that only hold None in the first part, and columns missing in some parts
+    store.append({'seed': 1, 'packet_trace': None, 'avg_delay': None, 'flag': None})
+    store.append({'seed': 2, 'packet_trace': 'traces', 'avg_delay': 1.5, 'flag': True})
+    store.append([{'seed': 3, 'packet_trace': None, 'avg_delay': None, 'flag': None, 'burn_in': 1_000},
+                  {'seed': 4, 'packet_trace': 'traces', 'avg_delay': 2.0, 'flag': False}])
+    store.compact()
+    store.append({'seed': 5})
+    table = store.read()
+
+    assert table['packet_trace'].dtype.kind == 'U'
+    assert table['packet_trace'].tolist() == ['', 'traces', '', 'traces', '']
+    np.testing.assert_array_equal(table['avg_delay'], [np.nan, 1.5, np.nan, 2.0, np.nan])
+    np.testing.assert_array_equal(table['flag'], [np.nan, 1, np.nan, 0, np.nan])
+    np.testing.assert_array_equal(table['burn_in'], [np.nan, np.nan, 1_000, np.nan, np.nan])
+
+
+def append_and_read(path, worker):
+    store = ResultsStore(path)
+    for seed in range(25):
+        store.append({'worker': worker, 'seed': seed})
+        store.read()
+
+
+def test_concurrent_appends_and_reads(tmp_path):
+    # Reads compact the store while other processes append and compact it
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        pool.starmap(append_and_read, [(str(tmp_path), worker) for worker in range(4)])
+    table = ResultsStore(str(tmp_path)).read()
+    assert sorted(zip(table['worker'].tolist(), table['seed'].tolist())) == [(worker, seed) for worker in range(4)
+                                                                             for seed in range(25)]
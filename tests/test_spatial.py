@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from core.simulator_entities import Coordinate
+from core.compute import pairs_in_range
+from core.spatial import SpatialGrid, cell_pairs
+
+"""
+Grid candidate pairs (core.spatial) must contain every pair of nodes in range,
+each exactly once, wherever the nodes are: on cell boundaries, at negative
+coordinates and at the edges of the field
+"""
+
+POWER = 150  # Radio range is POWER / 2, the cell size
+SEED = 4
+
+
+class GridNode:
+    def __init__(self, index, x, y):
+        self.index = index
+        self.coordinate = Coordinate(x, y)
+
+
+def positions():
+    rng = np.random.default_rng(SEED)
+    cell = POWER / 2
+    # Random, exactly on cell boundaries and corners, just beside them, negative and at the field edges
+    xs = [rng.uniform(-200, 1_000, 300),
+          np.arange(-3, 12) * cell,
+          np.arange(-3, 12) * cell - 1e-9,
+          np.full(15, 800.0),
+          rng.choice(np.arange(-2, 11) * cell, 40) + rng.choice([0, cell, -cell, 1e-9], 40)]
+    ys = [rng.uniform(-200, 1_000, 300),
+          np.arange(-3, 12) * cell,
+          np.zeros(15),
+          np.arange(-3, 12) * cell,
+          rng.choice(np.arange(-2, 11) * cell, 40)]
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def all_pairs_in_range(xs, ys):
+    first, second = np.triu_indices(len(xs), 1)
+    in_range = pairs_in_range(xs, ys, first, second, POWER)
+    return set(zip(first[in_range].tolist(), second[in_range].tolist()))
+
+
+def check_candidates(xs, ys, first, second):
+    assert np.all(first < second)
+    candidates = list(zip(first.tolist(), second.tolist()))
+    assert len(candidates) == len(set(candidates)), 'Pair produced more than once'
+    in_range = pairs_in_range(xs, ys, first, second, POWER)
+    assert set(zip(first[in_range].tolist(), second[in_range].tolist())) == all_pairs_in_range(xs, ys)
+    return set(candidates)
+
+
+def test_grid_candidates_hold_all_pairs_in_range():
+    xs, ys = positions()
+    grid = SpatialGrid(POWER / 2)
+    for index, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+        grid.insert(GridNode(index, x, y))
+    grid_pairs = check_candidates(xs, ys, *grid.candidate_pairs())
+
+    # Array version, from the same cells
+    cell_x = np.floor_divide(xs, POWER / 2).astype(np.int64)
+    cell_y = np.floor_divide(ys, POWER / 2).astype(np.int64)
+    assert check_candidates(xs, ys, *cell_pairs(cell_x, cell_y)) == grid_pairs
+
+
+def test_grid_follows_moved_nodes():
+    xs, ys = positions()
+    grid = SpatialGrid(POWER / 2)
+    nodes = [GridNode(index, x, y) for index, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))]
+    for node in nodes:
+        grid.insert(node)
+    rng = np.random.default_rng(SEED + 1)
+    xs, ys = xs + rng.uniform(-100, 100, len(xs)), ys + rng.uniform(-100, 100, len(ys))
+    for node, x, y in zip(nodes, xs.tolist(), ys.tolist()):
+        node.coordinate = Coordinate(x, y)
+        grid.update(node)
+    assert all(grid.node_cells[node] == grid.cell_of(node.coordinate) for node in nodes)
+    check_candidates(xs, ys, *grid.candidate_pairs())
+
+
+def test_no_pairs():
+    assert [len(array) for array in cell_pairs(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))] == [0, 0]
+    assert [len(array) for array in SpatialGrid(10).candidate_pairs()] == [0, 0]
+    with pytest.raises(ValueError):
+        SpatialGrid(0)
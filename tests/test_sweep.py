@@ -0,0 +1,36 @@
+from core.config import Config
+from core.engine import Engine
+from core.results_store import ResultsStore
+from core.sweep import run_sweep
+
+"""
+Runs of a parameter sweep (core.sweep) must give the results of the same runs done
+one by one, stored in the order of the grid points and seeds
+"""
+
+SEEDS = [23423098, 1]
+GRID = {'strategy': ['mbf', 'random']}
+
+
+def result(row):
+    # Wall clock
+    return {name: value for name, value in row.items() if name not in ('end_time', 'wall_time')}
+
+
+def serial_result(seed, overrides):
+    engine = Engine(seed, Config(**overrides), result_files=False)
+    engine.run()
+    return result(engine.result_row(engine.summary()))
+
+
+def test_sweep_matches_serial_runs(tmp_path):
+    base = {'n_nodes': 30, 'max_sim_time': 10_000, 'results_path': str(tmp_path / 'unused')}
+    rows = run_sweep(GRID, SEEDS, str(tmp_path / 'sweep'), workers=2, base=base)
+
+    expected = [serial_result(seed, {**base, 'strategy': strategy}) for strategy in GRID['strategy'] for seed in SEEDS]
+    assert [result(row) for row in rows] == expected
+
+    table = ResultsStore(str(tmp_path / 'sweep')).read()
+    assert table['strategy'].tolist() == ['mbf', 'mbf', 'random', 'random']
+    assert table['seed'].tolist() == SEEDS * 2
+    assert table['success_count'].tolist() == [row['success_count'] for row in expected]
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.simulator_entities import Coordinate, Vector
+from core.trajectory import Trajectories
+
+"""
+Compiled trajectories (core.trajectory) must follow the tick engine's mobility:
+every segment moves like stepping Coordinate.move() tick by tick, ends where the
+stepping node arrives at its waypoint, and nodes stay put once finished
+"""
+
+SEED = 23423098
+
+
+@pytest.fixture(scope='module')
+def compiled(tmp_path_factory):
+    config = Config(n_nodes=30, num_waypoints=4, max_sim_time=60_000, array_backed_nodes=True,
+                    results_path=str(tmp_path_factory.mktemp('results')))
+    store = Engine(SEED, config, result_files=False).store
+    waypoints = store.waypoints.copy()
+    return Trajectories.compile(store, config), waypoints, config
+
+
+def test_segments_move_like_ticks(compiled):
+    trajectories, waypoints, config = compiled
+    for row in range(len(trajectories.lengths)):
+        for segment in range(trajectories.lengths[row] - 1):
+            start = float(trajectories.times[row, segment])
+            end = trajectories.segment_end(row, segment)
+            target = waypoints[row, trajectories.waypointer[row, segment]]
+            velocity = float(trajectories.velocity[row, segment])
+            coordinate = Coordinate(float(trajectories.x[row, segment]), float(trajectories.y[row, segment]))
+            vector = Vector(velocity, float(trajectories.heading[row, segment]))
+
+            ticks = 0
+            while math.dist([coordinate.x, coordinate.y], target) >= velocity:
+                coordinate.move(vector, config=config)
+                ticks += 1
+                time = start + ticks * config.simulation_interval
+                if time <= end:
+                    x, y = trajectories.positions(time, np.array([row]))
+                    # Ticks round positions to the granularity
+                    assert math.dist([coordinate.x, coordinate.y], [x[0], y[0]]) <= ticks * 10 ** -config.granularity
+            # The stepping node arrives in the tick the segment ends in
+            assert start + (ticks - 1) * config.simulation_interval < end <= start + ticks * config.simulation_interval
+
+
+def test_segments_start_at_arrivals(compiled):
+    trajectories, waypoints, config = compiled
+    for row in range(len(trajectories.lengths)):
+        for segment in range(1, trajectories.lengths[row]):
+            x, y = float(trajectories.x[row, segment]), float(trajectories.y[row, segment])
+            # Turned within velocity of the previous waypoint, towards the next one, right away if the
+            # previous segment started that close
+            previous = waypoints[row, trajectories.waypointer[row, segment - 1]]
+            if trajectories.times[row, segment] > trajectories.times[row, segment - 1]:
+                assert math.dist([x, y], previous) == pytest.approx(trajectories.velocity[row, segment - 1])
+            # The segment's start is where the previous one is at its end
+            end_x, end_y = trajectories.positions(trajectories.times[row, segment], np.array([row]),
+                                                  np.array([segment - 1]))
+            assert (end_x[0], end_y[0]) == pytest.approx((x, y))
+            if not trajectories.finished[row, segment]:
+                target = waypoints[row, trajectories.waypointer[row, segment]]
+                assert trajectories.heading[row, segment] == pytest.approx(math.atan2(target[1] - y, target[0] - x))
+
+
+def test_finished_nodes_pause(compiled):
+    trajectories, _, _ = compiled
+    rows = trajectories.rows
+    last = trajectories.lengths - 1
+    assert trajectories.finished[rows, last].all()
+    end = trajectories.times[rows, last]
+    for later in (0, 1_000, 1e9):
+        x, y = trajectories.positions(end.max() + later)
+        assert np.array_equal(x, trajectories.x[rows, last]) and np.array_equal(y, trajectories.y[rows, last])
+    assert np.array_equal(trajectories.segment_at(end.max() + 1e9), last)
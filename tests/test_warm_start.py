@@ -0,0 +1,62 @@
+import pytest
+
+from core.config import Config
+from core.engine import Engine
+from core.warm_start import WarmStart
+
+"""
+Variants forked from a burn-in (core.warm_start) must not depend on each other: with
+a burn-in of 0 ms every variant is exactly the cold run of its config, whatever the
+order the variants are given in
+"""
+
+SEED = 23423098
+VARIANTS = [{'strategy': 'mbf'}, {'strategy': 'prophet'}, {'strategy': 'random'}]
+
+
+def config(tmp_path, **overrides):
+    return Config(n_nodes=50, max_sim_time=20_000, mobility_cache=None, results_path=str(tmp_path), **overrides)
+
+
+def result(row):
+    # Wall clock and warm start fields
+    return {name: value for name, value in row.items() if name not in ('end_time', 'wall_time', 'burn_in')}
+
+
+def cold_result(tmp_path, overrides):
+    engine = Engine(SEED, config(tmp_path, **overrides), result_files=False)
+    engine.run()
+    return result(engine.result_row(engine.summary()))
+
+
+def test_variants_without_burn_in_match_cold_runs(tmp_path):
+    expected = [cold_result(tmp_path, overrides) for overrides in VARIANTS]
+    rows = WarmStart(SEED, config(tmp_path), VARIANTS, burn_in=0).run(workers=2)
+    assert [result(row) for row in rows] == expected
+
+    reversed_rows = WarmStart(SEED, config(tmp_path), VARIANTS[::-1], burn_in=0).run(workers=1)
+    assert [result(row) for row in reversed_rows] == expected[::-1]
+
+
+def test_variant_results_do_not_depend_on_order(tmp_path):
+    rows = WarmStart(SEED, config(tmp_path), VARIANTS, burn_in=5_000).run(workers=1)
+    reversed_rows = WarmStart(SEED, config(tmp_path), VARIANTS[::-1], burn_in=5_000).run(workers=3)
+    assert [result(row) for row in reversed_rows] == [result(row) for row in rows][::-1]
+    assert all(row['burn_in'] == 5_000 for row in rows)
+
+
+def test_variant_fields_only():
+    with pytest.raises(ValueError):
+        WarmStart(SEED, Config(mobility_cache=None), [{'n_nodes': 10}], burn_in=0)
+
+
+class LargeResultWarmStart(WarmStart):
+    def run_variant(self, index):
+        # Far more than a pipe buffer holds
+        return {**super().run_variant(index), 'padding': 'x' * 4_000_000}
+
+
+def test_large_results_do_not_block_children(tmp_path):
+    rows = LargeResultWarmStart(SEED, config(tmp_path), VARIANTS, burn_in=1_000).run(workers=2)
+    assert [row['strategy'] for row in rows] == [overrides['strategy'] for overrides in VARIANTS]
+    assert all(len(row['padding']) == 4_000_000 for row in rows)